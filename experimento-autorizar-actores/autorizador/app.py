@@ -8,22 +8,31 @@
 # Opcional (si UPSTREAM_AUTH=gcp): google-auth
 
 import os
+import re
+import math
 import logging
-import requests
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import quote
 from flask import Flask, request, jsonify, Response
 
 import jwt
-from jwt import PyJWKClient
 from jwt.exceptions import (
     InvalidSignatureError, ExpiredSignatureError,
-    InvalidAudienceError, InvalidIssuerError, PyJWKClientError,
+    InvalidAudienceError, InvalidIssuerError,
 )
 
+from id_token_provider import IdTokenProvider, google_auth_fetcher, metadata_fetcher
+from jwks_store import JWKSStore
+from log_config import configure_logging
+from policy import effective_roles, load_policies
+from resilience import AdaptiveLimiter, CircuitBreaker, UpstreamGuard, UpstreamRejected
+from token_cache import VerifiedTokenCache
+from upstream import UpstreamClient
+
 # ------- (Opcional) Google Auth para llamar Cloud Run privado -------
 google_auth_available = False
 try:
-    from google.auth.transport import requests as google_requests
-    from google.oauth2 import id_token as google_id_token
+    from google.oauth2 import id_token as google_id_token  # noqa: F401
     google_auth_available = True
 except Exception:
     google_auth_available = False
@@ -40,20 +49,125 @@ HISTORIAL_BASE  = os.getenv("HISTORIAL_BASE", "https://historial-service-1590673
 HTTP_TIMEOUT    = int(os.getenv("HTTP_TIMEOUT", "10"))
 CLOCK_SKEW      = int(os.getenv("CLOCK_SKEW", "10"))  # tolerancia reloj (segundos)
 REQUIRED_PERMISSION = os.getenv("REQUIRED_PERMISSION", "historial.read")
+# Políticas por ruta (JSON); vacío = REQUIRED_PERMISSION o rol GerenteCuenta
+POLICY_FILE         = os.getenv("POLICY_FILE", "")
+
+# JWKS: refresco en segundo plano + límites ante kids desconocidos
+JWKS_REFRESH_SEC     = float(os.getenv("JWKS_REFRESH_SEC", "300"))
+JWKS_MIN_REFRESH_SEC = float(os.getenv("JWKS_MIN_REFRESH_SEC", "10"))
+JWKS_NEGATIVE_TTL    = float(os.getenv("JWKS_NEGATIVE_TTL", "60"))
 
 # Llamada a upstream (historial) con ID token de GCP (Cloud Run privado)
 # UPSTREAM_AUTH = 'none' (por defecto) o 'gcp'
 UPSTREAM_AUTH   = os.getenv("UPSTREAM_AUTH", "none").lower()
 TARGET_AUDIENCE = os.getenv("TARGET_AUDIENCE", HISTORIAL_BASE)  # para ID token
+# Servidor de metadata alternativo (fake local); vacío = google-auth
+GCP_METADATA_HOST       = os.getenv("GCP_METADATA_HOST", "")
+ID_TOKEN_REFRESH_MARGIN = float(os.getenv("ID_TOKEN_REFRESH_MARGIN", "300"))
+
+# Pool de conexiones keep-alive hacia el historial (uno por worker)
+UPSTREAM_POOL_SIZE       = int(os.getenv("UPSTREAM_POOL_SIZE", "10"))
+UPSTREAM_CONNECT_TIMEOUT = float(os.getenv("UPSTREAM_CONNECT_TIMEOUT", "3"))
+UPSTREAM_READ_TIMEOUT    = float(os.getenv("UPSTREAM_READ_TIMEOUT", str(HTTP_TIMEOUT)))
+UPSTREAM_RETRIES         = int(os.getenv("UPSTREAM_RETRIES", "2"))
+
+# Circuit breaker y límite adaptativo de llamadas en vuelo hacia el historial
+BREAKER_WINDOW_SEC       = float(os.getenv("BREAKER_WINDOW_SEC", "30"))
+BREAKER_MIN_REQUESTS     = int(os.getenv("BREAKER_MIN_REQUESTS", "20"))
+BREAKER_ERROR_RATE       = float(os.getenv("BREAKER_ERROR_RATE", "0.5"))
+BREAKER_SLOW_CALL_MS     = float(os.getenv("BREAKER_SLOW_CALL_MS", "2000"))
+BREAKER_SLOW_RATE        = float(os.getenv("BREAKER_SLOW_RATE", "0.8"))
+BREAKER_OPEN_SEC         = float(os.getenv("BREAKER_OPEN_SEC", "15"))
+BREAKER_HALF_OPEN_PROBES = int(os.getenv("BREAKER_HALF_OPEN_PROBES", "3"))
+LIMIT_INITIAL            = int(os.getenv("LIMIT_INITIAL", "20"))
+LIMIT_MIN                = int(os.getenv("LIMIT_MIN", "2"))
+LIMIT_MAX                = int(os.getenv("LIMIT_MAX", "200"))
+LIMIT_TARGET_MS          = float(os.getenv("LIMIT_TARGET_MS", "1000"))
+LIMIT_BACKOFF            = float(os.getenv("LIMIT_BACKOFF", "0.7"))
+
+# Pass-through en streaming del cuerpo del historial (memoria constante por request)
+UPSTREAM_STREAMING = os.getenv("UPSTREAM_STREAMING", "false").lower() == "true"
+STREAM_CHUNK_SIZE  = int(os.getenv("STREAM_CHUNK_SIZE", str(64 * 1024)))
+# Cabeceras que se propagan tal cual: el cuerpo se reenvía sin decodificar
+STREAM_PASSTHROUGH_HEADERS = ("Content-Length", "ETag", "Content-Encoding")
+
+# Consulta en lote (POST /historial:batch)
+BATCH_MAX_IDS     = int(os.getenv("BATCH_MAX_IDS", "100"))
+BATCH_MAX_WORKERS = int(os.getenv("BATCH_MAX_WORKERS", "8"))
+# IDs de cliente aceptados en el lote: sin "/", sin "%" y sin empezar por "." (nada de "../")
+CLIENTE_ID_RE     = re.compile(r"[A-Za-z0-9_-][A-Za-z0-9._:-]{0,127}")
+# true: intenta primero el endpoint bulk del historial y solo hace fan-out si no existe
+BATCH_UPSTREAM_BULK = os.getenv("BATCH_UPSTREAM_BULK", "true").lower() == "true"
+
+# Cache de tokens verificados (evita RS256 en tokens repetidos)
+TOKEN_CACHE_ENABLED   = os.getenv("TOKEN_CACHE_ENABLED", "true").lower() == "true"
+TOKEN_CACHE_MAX_BYTES = int(os.getenv("TOKEN_CACHE_MAX_BYTES", str(8 * 1024 * 1024)))
 
 # -------------------------- Logging ---------------------------------
+LOG_LEVEL  = os.getenv("LOG_LEVEL", "INFO")
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text").lower()   # text | json
+LOG_ASYNC  = os.getenv("LOG_ASYNC", "false").lower() == "true"
+
 log = logging.getLogger("authz")
-logging.basicConfig(level=logging.DEBUG, format="%(asctime)s | %(levelname)s | %(message)s")
+configure_logging(LOG_LEVEL, LOG_FORMAT, LOG_ASYNC)
 
-# ---------------------- JWKS (cacheado por PyJWKClient) -------------
+# ---------------------- JWKS (índice kid -> llave) -------------------
 if not JWKS_URL:
     raise RuntimeError("JWKS_URL no configurado")
-jwk_client = PyJWKClient(JWKS_URL, cache_keys=True)
+jwks_store = JWKSStore(
+    JWKS_URL,
+    refresh_interval=JWKS_REFRESH_SEC,
+    min_refresh_interval=JWKS_MIN_REFRESH_SEC,
+    negative_ttl=JWKS_NEGATIVE_TTL,
+    timeout=HTTP_TIMEOUT,
+)
+jwks_store.start()
+
+# ---------------------- Políticas compiladas -------------------------
+policy_engine = load_policies(POLICY_FILE, REQUIRED_PERMISSION)
+
+# ---------------------- Cache de tokens verificados ------------------
+token_cache = VerifiedTokenCache(TOKEN_CACHE_MAX_BYTES, clock_skew=CLOCK_SKEW)
+
+# ---------------------- Cliente upstream (historial) -----------------
+historial_guard = UpstreamGuard(
+    CircuitBreaker(
+        window_sec=BREAKER_WINDOW_SEC,
+        min_requests=BREAKER_MIN_REQUESTS,
+        error_rate=BREAKER_ERROR_RATE,
+        slow_call_ms=BREAKER_SLOW_CALL_MS,
+        slow_rate=BREAKER_SLOW_RATE,
+        open_sec=BREAKER_OPEN_SEC,
+        half_open_probes=BREAKER_HALF_OPEN_PROBES,
+    ),
+    AdaptiveLimiter(
+        initial=LIMIT_INITIAL,
+        min_limit=LIMIT_MIN,
+        max_limit=LIMIT_MAX,
+        target_ms=LIMIT_TARGET_MS,
+        backoff=LIMIT_BACKOFF,
+    ),
+)
+historial_client = UpstreamClient(
+    HISTORIAL_BASE,
+    pool_size=UPSTREAM_POOL_SIZE,
+    connect_timeout=UPSTREAM_CONNECT_TIMEOUT,
+    read_timeout=UPSTREAM_READ_TIMEOUT,
+    retries=UPSTREAM_RETRIES,
+    guard=historial_guard,
+)
+
+# ---------------------- ID tokens GCP (UPSTREAM_AUTH=gcp) ------------
+id_token_provider = None
+if UPSTREAM_AUTH == "gcp" and (GCP_METADATA_HOST or google_auth_available):
+    id_token_provider = IdTokenProvider(
+        metadata_fetcher(GCP_METADATA_HOST) if GCP_METADATA_HOST else google_auth_fetcher(),
+        refresh_margin=ID_TOKEN_REFRESH_MARGIN,
+    )
+    id_token_provider.start()
+
+# ---------------------- Pool para el fan-out de lotes ----------------
+batch_executor = ThreadPoolExecutor(max_workers=BATCH_MAX_WORKERS, thread_name_prefix="batch")
 
 # --------------------------- App Flask -------------------------------
 app = Flask(__name__)
@@ -75,31 +189,46 @@ def _bearer_token(req) -> str | None:
     return None
 
 
-def _jwks_kids_now():
+def _passthrough_headers(upstream_headers) -> dict:
+    headers = {"Content-Type": upstream_headers.get("Content-Type", "application/json")}
+    for name in STREAM_PASSTHROUGH_HEADERS:
+        value = upstream_headers.get(name)
+        if value is not None:
+            headers[name] = value
+    return headers
+
+
+def _batch_ids(payload) -> tuple[list[str] | None, str | None]:
+    ids = (payload or {}).get("clienteIds") if isinstance(payload, dict) else None
+    if not isinstance(ids, list) or not ids:
+        return None, "clienteIds must be a non-empty list"
+    if len(ids) > BATCH_MAX_IDS:
+        return None, f"too many clienteIds (max {BATCH_MAX_IDS})"
+    if not all(isinstance(x, str) and CLIENTE_ID_RE.fullmatch(x) for x in ids):
+        return None, "clienteIds must match [A-Za-z0-9_-][A-Za-z0-9._:-]{0,127}"
+    return list(dict.fromkeys(ids)), None
+
+
+def _historial_path(cliente_id: str) -> str:
+    # El ID va como un único segmento: quote sin "safe" codifica "/", "?", "#" y "%"
+    return f"/historial/{quote(cliente_id, safe='')}"
+
+
+def _batch_item(cliente_id: str, status: int, body) -> dict:
+    return {"clienteId": cliente_id, "status": status, "body": body}
+
+
+def _response_body(r):
     try:
-        r = requests.get(JWKS_URL, timeout=HTTP_TIMEOUT)
-        r.raise_for_status()
-        return [k.get("kid") for k in (r.json() or {}).get("keys", [])]
-    except Exception as e:
-        log.warning(f"[authz] Error leyendo JWKS_URL={JWKS_URL}: {e}")
-        return []
-
-
-def _extract_roles_and_perms(claims: dict) -> set[str]:
-    eff = set()
-    # Keycloak realm roles
-    for r in (claims.get("realm_access", {}) or {}).get("roles", []) or []:
-        eff.add(str(r).strip())
-    # Keycloak client roles
-    for _, obj in (claims.get("resource_access", {}) or {}).items():
-        for r in obj.get("roles", []) or []:
-            eff.add(str(r).strip())
-    # Atajos y otros esquemas
-    if "role" in claims:
-        eff.add(str(claims["role"]).strip())
-    for p in claims.get("permissions", []) or []:
-        eff.add(str(p).strip())
-    return {x.lower() for x in eff}
+        return r.json()
+    except ValueError:
+        return r.text
+
+
+def _rejection(e: UpstreamRejected) -> tuple[dict, int, dict]:
+    """503 inmediato cuando el breaker o el límite de concurrencia no dejan pasar la llamada."""
+    body = {"error": "upstream_unavailable", "reason": e.reason}
+    return body, 503, {"Retry-After": str(math.ceil(e.retry_after))}
 
 
 def _pick_user_id(claims: dict) -> str:
@@ -112,54 +241,79 @@ def _pick_user_id(claims: dict) -> str:
 
 def _get_gcp_id_token(audience: str) -> str | None:
     """
-    Genera un ID token para invocar Cloud Run privado.
-    Requiere google-auth y credenciales del SA (en Cloud Run viene por defecto).
+    Devuelve un ID token (cacheado hasta cerca de su exp) para invocar Cloud Run privado.
+    Requiere google-auth y credenciales del SA (en Cloud Run viene por defecto)
+    o un servidor de metadata en GCP_METADATA_HOST.
     """
-    if not google_auth_available:
+    if id_token_provider is None:
         log.error("[authz] google-auth no está disponible pero UPSTREAM_AUTH=gcp")
         return None
-    try:
-        req = google_requests.Request()
-        token = google_id_token.fetch_id_token(req, audience)
-        return token
-    except Exception as e:
-        log.error(f"[authz] No se pudo obtener ID token para audience={audience}: {e}")
-        return None
+    return id_token_provider.get(audience)
 
 
 # --------------------------- Autorización ----------------------------
-def _authorize(token: str):
+def _authorize(token: str, route: str = "historial"):
+    return _authorize_from_cache(token, route) or _authorize_and_cache(token, route)
+
+
+def _authorize_from_cache(token: str, route: str = "historial"):
+    # 0) Token ya verificado: se omite la verificación RS256
+    cached = token_cache.get(token) if TOKEN_CACHE_ENABLED else None
+    if cached is None:
+        return None
+    return _check_permissions(cached.claims, cached.mask, route)
+
+
+def _authorize_and_cache(token: str, route: str = "historial"):
+    claims, code, err = _verify_token(token)
+    if code != 200:
+        return None, code, err
+
+    if log.isEnabledFor(logging.INFO):
+        log.info("[authz] effective=%s", sorted(effective_roles(claims)))
+    mask = policy_engine.mask_for(claims)
+    if TOKEN_CACHE_ENABLED:
+        token_cache.put(token, claims, mask)
+    return _check_permissions(claims, mask, route)
+
+
+def _check_permissions(claims: dict, mask: int, route: str):
+    if policy_engine.allows(route, mask):
+        return claims, 200, None
+
+    return None, 403, {
+        "detail": "forbidden: missing permission/role",
+        "required": policy_engine.required(route)
+    }
+
+
+def _verify_token(token: str):
     # 1) Header sin verificar
     try:
         header = jwt.get_unverified_header(token)
     except Exception as e:
-        log.error(f"[authz] Token malformado: {e}")
+        log.error("[authz] Token malformado: %s", e)
         return None, 401, {"detail": f"malformed token: {e}"}
 
     kid = header.get("kid"); alg = header.get("alg")
-    log.debug(f"[authz] Header -> kid={kid} alg={alg}")
-
-    # 2) Cuerpo sin verificar (para log de iss/aud)
-    try:
-        unverified = jwt.decode(token, options={"verify_signature": False})
-        log.debug(f"[authz] Unverified iss={unverified.get('iss')} aud={unverified.get('aud')}")
-    except Exception as e:
-        log.debug(f"[authz] No se pudo leer payload no-verificado: {e}")
+    log.debug("[authz] Header -> kid=%s alg=%s", kid, alg)
 
-    # 3) Clave de firma (con intento de refresh)
-    try:
-        signing_key = jwk_client.get_signing_key_from_jwt(token)
-    except PyJWKClientError:
-        log.warning(f"[authz] KID {kid} no encontrado en cache. Refrescando JWKS...")
-        _ = _jwks_kids_now()
+    # 2) Cuerpo sin verificar (solo para log de iss/aud: se omite si DEBUG está apagado)
+    if log.isEnabledFor(logging.DEBUG):
         try:
-            signing_key = jwk_client.get_signing_key_from_jwt(token)
-        except PyJWKClientError as e2:
-            msg = f"Unable to find signing key kid={kid} in JWKS."
-            log.error(f"[authz] {msg} err={e2}")
-            return None, 401, {"detail": msg, "error": "unauthorized"}
+            unverified = jwt.decode(token, options={"verify_signature": False})
+            log.debug("[authz] Unverified iss=%s aud=%s", unverified.get("iss"), unverified.get("aud"))
+        except Exception as e:
+            log.debug("[authz] No se pudo leer payload no-verificado: %s", e)
+
+    # 3) Clave de firma (el store refresca una sola vez ante un kid desconocido)
+    signing_key = jwks_store.get(kid)
+    if signing_key is None:
+        msg = f"Unable to find signing key kid={kid} in JWKS."
+        log.error("[authz] %s", msg)
+        return None, 401, {"detail": msg, "error": "unauthorized"}
 
-    log.debug(f"[authz] Using signing key kid={getattr(signing_key,'key_id',None)}")
+    log.debug("[authz] Using signing key kid=%s", signing_key.key_id)
 
     # 4) Verificación firma + issuer + audience
     try:
@@ -177,7 +331,7 @@ def _authorize(token: str):
             },
             leeway=CLOCK_SKEW,
         )
-        log.info(f"[authz] JWT OK sub={claims.get('sub')}")
+        log.info("[authz] JWT OK sub=%s", claims.get("sub"))
     except ExpiredSignatureError:
         return None, 401, {"detail": "token expired", "error": "unauthorized"}
     except InvalidAudienceError:
@@ -189,16 +343,7 @@ def _authorize(token: str):
     except Exception as e:
         return None, 401, {"detail": f"jwt decode error: {e}", "error": "unauthorized"}
 
-    effective = _extract_roles_and_perms(claims)
-    log.info(f"[authz] effective={sorted(effective)}")
-
-    if REQUIRED_PERMISSION.lower() in effective or "gerentecuenta" in effective:
-        return claims, 200, None
-
-    return None, 403, {
-        "detail": "forbidden: missing permission/role",
-        "required": [REQUIRED_PERMISSION, "GerenteCuenta"]
-    }
+    return claims, 200, None
 
 
 # ---------------------------- Endpoints ------------------------------
@@ -209,7 +354,18 @@ def ping():
 
 @app.get("/_debug/jwks")
 def dbg_jwks():
-    return jsonify(kids=_jwks_kids_now()), 200
+    return jsonify(jwks_store.stats()), 200
+
+
+@app.get("/_debug/token-cache")
+def dbg_token_cache():
+    return jsonify(enabled=TOKEN_CACHE_ENABLED, **token_cache.stats()), 200
+
+
+@app.get("/_debug/upstream")
+def dbg_upstream():
+    id_tokens = id_token_provider.stats() if id_token_provider else None
+    return jsonify({**historial_client.stats(), "id_tokens": id_tokens}), 200
 
 
 @app.post("/_debug/decode")
@@ -237,8 +393,85 @@ def get_historial(cliente_id):
     if code != 200:
         return jsonify(err), code
 
-    # 3) Headers requeridos por el micro de historial
-    fwd_headers = {
+    # 3-4) Headers para el micro de historial
+    fwd_headers = _upstream_headers(claims)
+    if fwd_headers is None:
+        return jsonify(error="upstream_auth", detail="missing id_token for Cloud Run"), 502
+
+    # 5) Llamada a upstream (no reenviamos Authorization del cliente)
+    try:
+        if UPSTREAM_STREAMING:
+            return _stream_historial(_historial_path(cliente_id), fwd_headers)
+        r = historial_client.get(_historial_path(cliente_id), headers=fwd_headers)
+        return Response(
+            r.content,
+            status=r.status_code,
+            headers={"Content-Type": r.headers.get("Content-Type", "application/json")}
+        )
+    except UpstreamRejected as e:
+        body, code, headers = _rejection(e)
+        return jsonify(body), code, headers
+    except Exception as e:
+        log.exception("[authz] Error llamando a historial")
+        return jsonify(error="upstream_error", detail=str(e)), 502
+
+
+@app.post("/historial:batch")
+def get_historial_batch():
+    # 1) Token del cliente: se autoriza una sola vez para todo el lote
+    token = _bearer_token(request)
+    if not token:
+        return jsonify(detail="missing bearer token"), 401
+
+    claims, code, err = _authorize(token, "historial_batch")
+    if code != 200:
+        return jsonify(err), code
+
+    ids, error = _batch_ids(request.get_json(silent=True))
+    if error:
+        return jsonify(error="invalid_request", detail=error), 400
+
+    fwd_headers = _upstream_headers(claims)
+    if fwd_headers is None:
+        return jsonify(error="upstream_auth", detail="missing id_token for Cloud Run"), 502
+
+    # 2) Una sola llamada bulk al historial; si no la soporta, fan-out concurrente acotado
+    items = _fetch_batch_bulk(ids, fwd_headers) if BATCH_UPSTREAM_BULK else None
+    if items is None:
+        items = list(batch_executor.map(lambda cid: _fetch_batch_one(cid, fwd_headers), ids))
+    return jsonify(items=items, count=len(items)), 200
+
+
+def _fetch_batch_bulk(ids: list[str], fwd_headers: dict) -> list[dict] | None:
+    try:
+        r = historial_client.post("/historial:batch", headers=fwd_headers, json={"clienteIds": ids})
+    except UpstreamRejected as e:
+        body, code, _ = _rejection(e)
+        return [_batch_item(cid, code, body) for cid in ids]
+    except Exception as e:
+        log.warning("[authz] Bulk de historial no disponible: %s", e)
+        return None
+    if r.status_code in (404, 405):
+        return None
+    if r.status_code != 200:
+        return [_batch_item(cid, r.status_code, _response_body(r)) for cid in ids]
+    return (r.json() or {}).get("items", [])
+
+
+def _fetch_batch_one(cliente_id: str, fwd_headers: dict) -> dict:
+    try:
+        r = historial_client.get(_historial_path(cliente_id), headers=fwd_headers)
+        return _batch_item(cliente_id, r.status_code, _response_body(r))
+    except UpstreamRejected as e:
+        body, code, _ = _rejection(e)
+        return _batch_item(cliente_id, code, body)
+    except Exception as e:
+        log.warning("[authz] Error llamando a historial cliente=%s: %s", cliente_id, e)
+        return _batch_item(cliente_id, 502, {"error": "upstream_error", "detail": str(e)})
+
+
+def _identity_headers(claims: dict) -> dict:
+    return {
         "X-Auth-Validated": "true",
         "X-User-Id": _pick_user_id(claims),
         # Trazabilidad opcional:
@@ -246,25 +479,33 @@ def get_historial(cliente_id):
         "X-Auth-Subject": str(claims.get("sub", "")),
     }
 
-    # 4) (Opcional) Cloud Run privado: adjuntar ID token de GCP
+
+def _upstream_headers(claims: dict) -> dict | None:
+    """Headers requeridos por el micro de historial; None si falta el ID token de GCP."""
+    fwd_headers = _identity_headers(claims)
+
+    # (Opcional) Cloud Run privado: adjuntar ID token de GCP
     if UPSTREAM_AUTH == "gcp":
         idt = _get_gcp_id_token(TARGET_AUDIENCE)
         if not idt:
-            return jsonify(error="upstream_auth", detail="missing id_token for Cloud Run"), 502
+            return None
         fwd_headers["Authorization"] = f"Bearer {idt}"
+    return fwd_headers
 
-    # 5) Llamada a upstream (no reenviamos Authorization del cliente)
-    try:
-        url = f"{HISTORIAL_BASE}/historial/{cliente_id}"
-        r = requests.get(url, headers=fwd_headers, timeout=HTTP_TIMEOUT)
-        return Response(
-            r.content,
-            status=r.status_code,
-            headers={"Content-Type": r.headers.get("Content-Type", "application/json")}
-        )
-    except Exception as e:
-        log.exception("[authz] Error llamando a historial")
-        return jsonify(error="upstream_error", detail=str(e)), 502
+
+def _stream_historial(path: str, fwd_headers: dict) -> Response:
+    # El cliente decide la codificación: se reenvían los bytes comprimidos tal cual
+    fwd_headers["Accept-Encoding"] = request.headers.get("Accept-Encoding", "identity")
+    r = historial_client.get(path, headers=fwd_headers, stream=True)
+
+    def body():
+        try:
+            yield from r.raw.stream(STREAM_CHUNK_SIZE, decode_content=False)
+        finally:
+            r.close()
+
+    return Response(body(), status=r.status_code, headers=_passthrough_headers(r.headers),
+                    direct_passthrough=True)
 
 
 # -------------------------- Main (local) -----------------------------
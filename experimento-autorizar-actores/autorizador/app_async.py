@@ -0,0 +1,221 @@
+# app_async.py
+# Autorizador MediSupply — modo ASGI (asyncio)
+# - Mismas rutas y misma semántica de _authorize que app.py (se reutiliza su lógica)
+# - La verificación RS256 (CPU) corre en un executor; los hits del cache no salen del loop
+# - Llamadas al historial con httpx y un pool de conexiones compartido
+# Reqs: quart, httpx, uvicorn (además de las de app.py)
+# Ejecutar: uvicorn app_async:app --host 0.0.0.0 --port 8080
+
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import jwt
+from quart import Quart, request, jsonify, Response
+
+import app as sync_app
+from app import (
+    REALM_ISS, JWKS_URL, CLIENT_AUD, HISTORIAL_BASE, TARGET_AUDIENCE, UPSTREAM_AUTH,
+    UPSTREAM_CONNECT_TIMEOUT, UPSTREAM_READ_TIMEOUT, UPSTREAM_RETRIES, TOKEN_CACHE_ENABLED,
+    UPSTREAM_STREAMING, STREAM_CHUNK_SIZE, BATCH_MAX_WORKERS, BATCH_UPSTREAM_BULK,
+    _bearer_token, _identity_headers, _get_gcp_id_token, _passthrough_headers,
+    _batch_ids, _batch_item, _historial_path, _response_body, _rejection,
+    _authorize_from_cache, _authorize_and_cache,
+    jwks_store, token_cache, historial_guard, log,
+)
+from resilience import UpstreamRejected
+from upstream_async import AsyncUpstreamClient
+
+# ---------------------- Configuración / Entorno ----------------------
+AUTHZ_EXECUTOR_WORKERS = int(os.getenv("AUTHZ_EXECUTOR_WORKERS", str(os.cpu_count() or 2)))
+ASYNC_MAX_CONNECTIONS  = int(os.getenv("ASYNC_MAX_CONNECTIONS", "200"))
+ASYNC_MAX_KEEPALIVE    = int(os.getenv("ASYNC_MAX_KEEPALIVE", "50"))
+
+# Executor para trabajo bloqueante/CPU (RS256, fetch de JWKS o ID token)
+executor = ThreadPoolExecutor(max_workers=AUTHZ_EXECUTOR_WORKERS, thread_name_prefix="authz")
+
+historial_client = AsyncUpstreamClient(
+    HISTORIAL_BASE,
+    max_connections=ASYNC_MAX_CONNECTIONS,
+    max_keepalive=ASYNC_MAX_KEEPALIVE,
+    connect_timeout=UPSTREAM_CONNECT_TIMEOUT,
+    read_timeout=UPSTREAM_READ_TIMEOUT,
+    retries=UPSTREAM_RETRIES,
+    guard=historial_guard,
+)
+
+# --------------------------- App Quart -------------------------------
+app = Quart(__name__)
+
+
+@app.before_serving
+async def _startup():
+    await historial_client.start()
+
+
+@app.after_serving
+async def _shutdown():
+    await historial_client.close()
+
+
+async def _run_blocking(fn, *args):
+    return await asyncio.get_running_loop().run_in_executor(executor, fn, *args)
+
+
+async def _authorize_async(token: str, route: str = "historial"):
+    return _authorize_from_cache(token, route) or await _run_blocking(_authorize_and_cache, token, route)
+
+
+async def _id_token_async(audience: str) -> str | None:
+    provider = sync_app.id_token_provider
+    cached = provider.peek(audience) if provider is not None else None
+    return cached or await _run_blocking(_get_gcp_id_token, audience)
+
+
+async def _upstream_headers_async(claims: dict) -> dict | None:
+    fwd_headers = _identity_headers(claims)
+    if UPSTREAM_AUTH == "gcp":
+        idt = await _id_token_async(TARGET_AUDIENCE)
+        if not idt:
+            return None
+        fwd_headers["Authorization"] = f"Bearer {idt}"
+    return fwd_headers
+
+
+# ---------------------------- Endpoints ------------------------------
+@app.get("/ping")
+async def ping():
+    return jsonify(ok=True, iss=REALM_ISS, jwks=JWKS_URL, aud=CLIENT_AUD), 200
+
+
+@app.get("/_debug/jwks")
+async def dbg_jwks():
+    return jsonify(jwks_store.stats()), 200
+
+
+@app.get("/_debug/token-cache")
+async def dbg_token_cache():
+    return jsonify(enabled=TOKEN_CACHE_ENABLED, **token_cache.stats()), 200
+
+
+@app.get("/_debug/upstream")
+async def dbg_upstream():
+    provider = sync_app.id_token_provider
+    id_tokens = provider.stats() if provider else None
+    return jsonify({**historial_client.stats(), "id_tokens": id_tokens}), 200
+
+
+@app.post("/_debug/decode")
+async def dbg_decode():
+    token = _bearer_token(request) or ((await request.get_json(silent=True)) or {}).get("token")
+    if not token:
+        return jsonify(error="missing token"), 400
+    try:
+        header = jwt.get_unverified_header(token)
+        payload = jwt.decode(token, options={"verify_signature": False})
+        return jsonify(header=header, payload=payload), 200
+    except Exception as e:
+        return jsonify(error=str(e)), 400
+
+
+@app.get("/historial/<cliente_id>")
+async def get_historial(cliente_id):
+    # 1) Token del cliente (Keycloak)
+    token = _bearer_token(request)
+    if not token:
+        return jsonify(detail="missing bearer token"), 401
+
+    # 2) Autorizar
+    claims, code, err = await _authorize_async(token)
+    if code != 200:
+        return jsonify(err), code
+
+    # 3-4) Headers para el micro de historial
+    fwd_headers = await _upstream_headers_async(claims)
+    if fwd_headers is None:
+        return jsonify(error="upstream_auth", detail="missing id_token for Cloud Run"), 502
+
+    # 5) Llamada a upstream sin bloquear el loop
+    try:
+        if UPSTREAM_STREAMING:
+            return await _stream_historial(_historial_path(cliente_id), fwd_headers)
+        r = await historial_client.get(_historial_path(cliente_id), headers=fwd_headers)
+        return Response(
+            r.content,
+            status=r.status_code,
+            headers={"Content-Type": r.headers.get("Content-Type", "application/json")}
+        )
+    except UpstreamRejected as e:
+        body, code, headers = _rejection(e)
+        return jsonify(body), code, headers
+    except Exception as e:
+        log.exception("[authz] Error llamando a historial")
+        return jsonify(error="upstream_error", detail=str(e)), 502
+
+
+@app.post("/historial:batch")
+async def get_historial_batch():
+    token = _bearer_token(request)
+    if not token:
+        return jsonify(detail="missing bearer token"), 401
+
+    claims, code, err = await _authorize_async(token, "historial_batch")
+    if code != 200:
+        return jsonify(err), code
+
+    ids, error = _batch_ids(await request.get_json(silent=True))
+    if error:
+        return jsonify(error="invalid_request", detail=error), 400
+
+    fwd_headers = await _upstream_headers_async(claims)
+    if fwd_headers is None:
+        return jsonify(error="upstream_auth", detail="missing id_token for Cloud Run"), 502
+
+    items = await _fetch_batch_bulk(ids, fwd_headers) if BATCH_UPSTREAM_BULK else None
+    if items is None:
+        limit = asyncio.Semaphore(BATCH_MAX_WORKERS)
+        items = await asyncio.gather(*(_fetch_batch_one(cid, fwd_headers, limit) for cid in ids))
+    return jsonify(items=list(items), count=len(items)), 200
+
+
+async def _fetch_batch_bulk(ids: list[str], fwd_headers: dict) -> list[dict] | None:
+    try:
+        r = await historial_client.post("/historial:batch", headers=fwd_headers, json={"clienteIds": ids})
+    except UpstreamRejected as e:
+        body, code, _ = _rejection(e)
+        return [_batch_item(cid, code, body) for cid in ids]
+    except Exception as e:
+        log.warning("[authz] Bulk de historial no disponible: %s", e)
+        return None
+    if r.status_code in (404, 405):
+        return None
+    if r.status_code != 200:
+        return [_batch_item(cid, r.status_code, _response_body(r)) for cid in ids]
+    return (r.json() or {}).get("items", [])
+
+
+async def _fetch_batch_one(cliente_id: str, fwd_headers: dict, limit: asyncio.Semaphore) -> dict:
+    async with limit:
+        try:
+            r = await historial_client.get(_historial_path(cliente_id), headers=fwd_headers)
+            return _batch_item(cliente_id, r.status_code, _response_body(r))
+        except UpstreamRejected as e:
+            body, code, _ = _rejection(e)
+            return _batch_item(cliente_id, code, body)
+        except Exception as e:
+            log.warning("[authz] Error llamando a historial cliente=%s: %s", cliente_id, e)
+            return _batch_item(cliente_id, 502, {"error": "upstream_error", "detail": str(e)})
+
+
+async def _stream_historial(path: str, fwd_headers: dict) -> Response:
+    fwd_headers["Accept-Encoding"] = request.headers.get("Accept-Encoding", "identity")
+    r = await historial_client.stream(path, headers=fwd_headers)
+
+    async def body():
+        try:
+            async for chunk in r.aiter_raw(STREAM_CHUNK_SIZE):
+                yield chunk
+        finally:
+            await r.aclose()
+
+    return Response(body(), status=r.status_code, headers=_passthrough_headers(r.headers))
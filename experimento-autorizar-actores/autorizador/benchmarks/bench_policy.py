@@ -0,0 +1,45 @@
+# bench_policy.py
+# Micro-benchmark: autorización por sets (regla histórica) vs PolicyEngine compilado
+# Uso: python benchmarks/bench_policy.py [roles_por_token ...]
+
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from policy import PolicyEngine, default_policies, effective_roles  # noqa: E402
+
+REQUIRED_PERMISSION = "historial.read"
+
+
+def make_claims(n_roles: int) -> dict:
+    """Token con n_roles repartidos entre realm y tres clientes; el permiso requerido al final."""
+    per_source = max(1, n_roles // 4)
+    clients = {f"client-{c}": {"roles": [f"Client{c}.Role{i}" for i in range(per_source)]} for c in range(3)}
+    realm = [f"Realm.Role{i}" for i in range(per_source)] + ["historial.read"]
+    return {"sub": "u-1", "realm_access": {"roles": realm}, "resource_access": clients}
+
+
+def legacy_check(claims: dict) -> bool:
+    effective = effective_roles(claims)
+    return REQUIRED_PERMISSION.lower() in effective or "gerentecuenta" in effective
+
+
+def main(sizes: list[int]) -> None:
+    engine = PolicyEngine(default_policies(REQUIRED_PERMISSION))
+    print(f"{'roles':>6} | {'sets (us)':>10} | {'compilado (us)':>14} | {'mascara cacheada (us)':>22}")
+    for n in sizes:
+        claims = make_claims(n)
+        mask = engine.mask_for(claims)
+        assert legacy_check(claims) == engine.allows("historial", mask)
+
+        number = max(200, 200_000 // max(n, 1))
+        t_sets = timeit.timeit(lambda: legacy_check(claims), number=number) / number
+        t_compiled = timeit.timeit(lambda: engine.allows("historial", engine.mask_for(claims)), number=number) / number
+        t_cached = timeit.timeit(lambda: engine.allows("historial", mask), number=number * 10) / (number * 10)
+        print(f"{n:>6} | {t_sets * 1e6:>10.2f} | {t_compiled * 1e6:>14.2f} | {t_cached * 1e6:>22.3f}")
+
+
+if __name__ == "__main__":
+    main([int(x) for x in sys.argv[1:]] or [10, 100, 300, 1000])
@@ -0,0 +1,154 @@
+# id_token_provider.py
+# ID tokens de GCP para invocar Cloud Run privado (UPSTREAM_AUTH=gcp)
+# - Cache por audience con el exp leído del propio token
+# - Refresco proactivo en un hilo antes del vencimiento; lectura sin lock en el hot path
+# - Si el refresco falla y el token venció, se obtiene uno nuevo de forma síncrona
+# - El servidor de metadata es reemplazable (GCP_METADATA_HOST) por un fake local
+
+import logging
+import threading
+import time
+from typing import Callable
+
+import jwt
+import requests
+
+log = logging.getLogger("authz")
+
+METADATA_IDENTITY_PATH = "/computeMetadata/v1/instance/service-accounts/default/identity"
+
+
+class _Entry:
+    __slots__ = ("token", "expires_at")
+
+    def __init__(self, token: str, expires_at: float):
+        self.token = token
+        self.expires_at = expires_at
+
+
+def google_auth_fetcher() -> Callable[[str], str]:
+    """Fetcher por defecto: google-auth (credenciales del SA de Cloud Run)."""
+    from google.auth.transport import requests as google_requests
+    from google.oauth2 import id_token as google_id_token
+
+    def fetch(audience: str) -> str:
+        return google_id_token.fetch_id_token(google_requests.Request(), audience)
+    return fetch
+
+
+def metadata_fetcher(host: str, timeout: float = 5.0) -> Callable[[str], str]:
+    """Fetcher directo contra un servidor de metadata (real o fake local)."""
+    base = host if host.startswith("http") else f"http://{host}"
+    session = requests.Session()
+
+    def fetch(audience: str) -> str:
+        r = session.get(
+            f"{base}{METADATA_IDENTITY_PATH}",
+            params={"audience": audience, "format": "full"},
+            headers={"Metadata-Flavor": "Google"},
+            timeout=timeout,
+        )
+        r.raise_for_status()
+        return r.text.strip()
+    return fetch
+
+
+class IdTokenProvider:
+    """Cache de ID tokens por audience con refresco en segundo plano."""
+
+    def __init__(self, fetcher: Callable[[str], str], refresh_margin: float = 300.0,
+                 expiry_guard: float = 30.0, check_interval: float = 30.0, clock=time.time):
+        self._fetcher = fetcher
+        self.refresh_margin = refresh_margin
+        self.expiry_guard = expiry_guard
+        self.check_interval = check_interval
+        self._clock = clock
+
+        self._tokens: dict[str, _Entry] = {}
+        self._locks: dict[str, threading.Lock] = {}
+        self._locks_guard = threading.Lock()
+        self.sync_fetches = 0
+        self.background_refreshes = 0
+        self.refresh_failures = 0
+
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def get(self, audience: str) -> str | None:
+        return self.peek(audience) or self._fetch_sync(audience)
+
+    def peek(self, audience: str) -> str | None:
+        """Token vigente en cache, sin bloquear; None si hay que obtener uno nuevo."""
+        entry = self._tokens.get(audience)
+        if entry is not None and entry.expires_at - self._clock() > self.expiry_guard:
+            return entry.token
+        return None
+
+    def stats(self) -> dict:
+        now = self._clock()
+        return {
+            "audiences": {aud: round(e.expires_at - now) for aud, e in list(self._tokens.items())},
+            "sync_fetches": self.sync_fetches,
+            "background_refreshes": self.background_refreshes,
+            "refresh_failures": self.refresh_failures,
+        }
+
+    # --------------------------- Obtención --------------------------
+    def _lock_for(self, audience: str) -> threading.Lock:
+        lock = self._locks.get(audience)
+        if lock is None:
+            with self._locks_guard:
+                lock = self._locks.setdefault(audience, threading.Lock())
+        return lock
+
+    def _fetch_sync(self, audience: str) -> str | None:
+        with self._lock_for(audience):
+            # Otro hilo pudo haberlo obtenido mientras esperábamos el lock
+            token = self.peek(audience)
+            if token is not None:
+                return token
+            try:
+                self.sync_fetches += 1
+                return self._store(audience, self._fetcher(audience)).token
+            except Exception as e:
+                log.error("[authz] No se pudo obtener ID token para audience=%s: %s", audience, e)
+                return None
+
+    def _store(self, audience: str, token: str) -> _Entry:
+        try:
+            exp = float(jwt.decode(token, options={"verify_signature": False})["exp"])
+        except Exception:
+            # Sin exp legible: se asume la vida mínima para forzar el refresco pronto
+            exp = self._clock() + self.refresh_margin + self.expiry_guard
+        entry = _Entry(token, exp)
+        self._tokens[audience] = entry
+        return entry
+
+    # --------------------------- Refresco ---------------------------
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name="id-token-refresher", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def refresh_due(self) -> None:
+        now = self._clock()
+        for audience, entry in list(self._tokens.items()):
+            if entry.expires_at - now > self.refresh_margin:
+                continue
+            try:
+                token = self._fetcher(audience)
+                with self._lock_for(audience):
+                    self._store(audience, token)
+                self.background_refreshes += 1
+            except Exception as e:
+                # El token vigente sigue sirviendo; al vencer, get() hace el fetch síncrono
+                self.refresh_failures += 1
+                log.warning("[authz] Refresco de ID token falló audience=%s: %s", audience, e)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.check_interval):
+            self.refresh_due()
@@ -0,0 +1,137 @@
+# jwks_store.py
+# Almacén de llaves JWKS para el Autorizador
+# - Índice kid -> llave en memoria, refrescado en segundo plano
+# - Ante un kid desconocido, un único fetch (single-flight) para todos los hilos
+# - Cache negativo de kids inválidos con intervalo mínimo entre refrescos forzados
+
+import logging
+import threading
+import time
+
+import requests
+from jwt import PyJWK
+from jwt.exceptions import PyJWKError
+
+log = logging.getLogger("authz")
+
+
+class JWKSStore:
+    """Llaves de firma por kid; los lectores nunca bloquean salvo en un kid desconocido."""
+
+    MAX_NEGATIVE = 1024
+
+    def __init__(self, jwks_url: str, refresh_interval: float = 300.0, min_refresh_interval: float = 10.0,
+                 negative_ttl: float = 60.0, timeout: float = 10.0, session: requests.Session | None = None):
+        self.jwks_url = jwks_url
+        self.refresh_interval = refresh_interval
+        self.min_refresh_interval = min_refresh_interval
+        self.negative_ttl = negative_ttl
+        self.timeout = timeout
+        self._session = session or requests.Session()
+
+        self._keys: dict[str, PyJWK] = {}
+        self._missing: dict[str, float] = {}   # kid -> instante hasta el que se rechaza sin refrescar
+        self._last_fetch = 0.0
+        self._last_error: str | None = None
+        self.fetches = 0
+
+        self._fetch_lock = threading.Lock()
+        self._inflight: threading.Event | None = None
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    # --------------------------- Consulta ---------------------------
+    def get(self, kid: str | None) -> PyJWK | None:
+        key = self._keys.get(kid)
+        if key is not None:
+            return key
+        if kid is None:
+            return None
+
+        now = time.monotonic()
+        if self._missing.get(kid, 0.0) > now:
+            return None
+        if now - self._last_fetch < self.min_refresh_interval and self._inflight is None:
+            return None
+        self.refresh()
+        key = self._keys.get(kid)
+        if key is None:
+            self._remember_missing(kid)
+        return key
+
+    def _remember_missing(self, kid: str) -> None:
+        now = time.monotonic()
+        if len(self._missing) >= self.MAX_NEGATIVE:
+            self._missing = {k: t for k, t in self._missing.items() if t > now}
+        if len(self._missing) < self.MAX_NEGATIVE:
+            self._missing[kid] = now + self.negative_ttl
+
+    def kids(self) -> list[str]:
+        return list(self._keys)
+
+    def stats(self) -> dict:
+        return {
+            "jwks_url": self.jwks_url,
+            "kids": self.kids(),
+            "negative_kids": sum(1 for t in self._missing.values() if t > time.monotonic()),
+            "fetches": self.fetches,
+            "age_seconds": round(time.monotonic() - self._last_fetch, 1) if self._last_fetch else None,
+            "last_error": self._last_error,
+        }
+
+    # --------------------------- Refresco ---------------------------
+    def refresh(self) -> None:
+        """Descarga el JWKS; si ya hay una descarga en curso, espera a que termine."""
+        with self._fetch_lock:
+            waiter = self._inflight
+            if waiter is None:
+                self._inflight = threading.Event()
+        if waiter is not None:
+            waiter.wait(self.timeout)
+            return
+
+        try:
+            self._fetch()
+        finally:
+            with self._fetch_lock:
+                done, self._inflight = self._inflight, None
+            done.set()
+
+    def _fetch(self) -> None:
+        self.fetches += 1
+        try:
+            r = self._session.get(self.jwks_url, timeout=self.timeout)
+            r.raise_for_status()
+            keys = {}
+            for jwk in (r.json() or {}).get("keys", []):
+                if jwk.get("use", "sig") != "sig" or not jwk.get("kid"):
+                    continue
+                try:
+                    keys[jwk["kid"]] = PyJWK(jwk)
+                except PyJWKError as e:
+                    log.warning("[authz] JWK kid=%s ignorado: %s", jwk.get("kid"), e)
+        except Exception as e:
+            self._last_error = str(e)
+            log.warning("[authz] Error leyendo JWKS_URL=%s: %s", self.jwks_url, e)
+            return
+        finally:
+            self._last_fetch = time.monotonic()
+
+        # Reemplazo atómico: los lectores ven el dict anterior o el nuevo
+        self._keys = keys
+        self._missing = {k: t for k, t in self._missing.items() if k not in keys}
+        self._last_error = None
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name="jwks-refresher", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            self.refresh()
+            self._stop.wait(self.refresh_interval)
@@ -0,0 +1,57 @@
+# log_config.py
+# Configuración de logging del Autorizador
+# - LOG_LEVEL: nivel del logger raíz (por defecto INFO)
+# - LOG_FORMAT: "text" (por defecto) o "json" (una línea JSON por evento, apta para Cloud Logging)
+# - LOG_ASYNC: "true" encola los registros (QueueHandler) y un hilo los escribe (QueueListener),
+#   así el hilo de la petición no espera la E/S de stdout
+
+import atexit
+import json
+import logging
+import logging.handlers
+import queue
+
+TEXT_FORMAT = "%(asctime)s | %(levelname)s | %(message)s"
+
+
+class JsonFormatter(logging.Formatter):
+    """Formato estructurado; con LOG_ASYNC=true corre en el hilo del QueueListener."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": self.formatTime(record),
+            "severity": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False)
+
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    """Encola el registro sin formatearlo; solo fija el mensaje por si los args mutan."""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+
+def configure_logging(level: str = "INFO", fmt: str = "text", use_queue: bool = False) -> None:
+    handler = logging.StreamHandler()
+    handler.setFormatter(JsonFormatter() if fmt == "json" else logging.Formatter(TEXT_FORMAT))
+
+    root = logging.getLogger()
+    root.handlers.clear()
+    root.setLevel(getattr(logging, level.upper(), logging.INFO))
+
+    if not use_queue:
+        root.addHandler(handler)
+        return
+
+    records: queue.SimpleQueue = queue.SimpleQueue()
+    root.addHandler(DeferredQueueHandler(records))
+    listener = logging.handlers.QueueListener(records, handler, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
@@ -0,0 +1,133 @@
+# policy.py
+# Políticas de autorización por ruta para el Autorizador
+# - Se cargan de un JSON (POLICY_FILE) y se compilan al arrancar
+# - Cada rol/permiso referenciado recibe un bit; el token se reduce a una máscara (int)
+# - Evaluar una ruta = dos operaciones de bits (any_of / all_of), sin construir sets
+#
+# Formato:
+# {
+#   "routes": {
+#     "historial": {"any_of": ["historial.read", "GerenteCuenta"]},
+#     "historial_batch": {"all_of": [{"client": "medisupply-client", "role": "historial.read"}]}
+#   }
+# }
+# Un string coincide con el rol en cualquier origen (realm, clientes, "role", "permissions");
+# {"client", "role"} solo con los roles de ese cliente en resource_access. Sin distinción de mayúsculas.
+
+import json
+
+
+def effective_roles(claims: dict) -> set[str]:
+    """Roles y permisos del token en minúsculas (para logs y como referencia del benchmark)."""
+    eff = set()
+    # Keycloak realm roles
+    for r in (claims.get("realm_access", {}) or {}).get("roles", []) or []:
+        eff.add(str(r).strip())
+    # Keycloak client roles
+    for _, obj in (claims.get("resource_access", {}) or {}).items():
+        for r in obj.get("roles", []) or []:
+            eff.add(str(r).strip())
+    # Atajos y otros esquemas
+    if "role" in claims:
+        eff.add(str(claims["role"]).strip())
+    for p in claims.get("permissions", []) or []:
+        eff.add(str(p).strip())
+    return {x.lower() for x in eff}
+
+
+class CompiledPolicy:
+    __slots__ = ("name", "any_mask", "all_mask", "required")
+
+    def __init__(self, name: str, any_mask: int, all_mask: int, required: list[str]):
+        self.name = name
+        self.any_mask = any_mask
+        self.all_mask = all_mask
+        self.required = required
+
+    def allows(self, mask: int) -> bool:
+        if self.any_mask and not mask & self.any_mask:
+            return False
+        return mask & self.all_mask == self.all_mask
+
+
+class PolicyEngine:
+    def __init__(self, config: dict):
+        self._global_bits: dict[str, int] = {}                  # rol -> bit
+        self._client_bits: dict[str, dict[str, int]] = {}       # cliente -> rol -> bit
+        self._next_bit = 0
+        self.routes: dict[str, CompiledPolicy] = {}
+        for name, spec in (config.get("routes") or {}).items():
+            self.routes[name] = self._compile(name, spec or {})
+
+    # --------------------------- Compilación --------------------------
+    def _bit(self, table: dict, key: str) -> int:
+        bit = table.get(key)
+        if bit is None:
+            bit = table[key] = 1 << self._next_bit
+            self._next_bit += 1
+        return bit
+
+    def _term(self, term) -> tuple[int, str]:
+        if isinstance(term, str):
+            role = term.strip().lower()
+            return self._bit(self._global_bits, role), term
+        if isinstance(term, dict) and term.get("client") and term.get("role"):
+            client, role = str(term["client"]), str(term["role"]).strip().lower()
+            return self._bit(self._client_bits.setdefault(client, {}), role), f"{client}:{term['role']}"
+        raise ValueError(f"término de política inválido: {term!r}")
+
+    def _compile(self, name: str, spec: dict) -> CompiledPolicy:
+        any_mask = all_mask = 0
+        required = []
+        for term in spec.get("any_of", []) or []:
+            bit, label = self._term(term)
+            any_mask |= bit
+            required.append(label)
+        for term in spec.get("all_of", []) or []:
+            bit, label = self._term(term)
+            all_mask |= bit
+            required.append(label)
+        if not any_mask and not all_mask:
+            raise ValueError(f"la política '{name}' no define any_of ni all_of")
+        return CompiledPolicy(name, any_mask, all_mask, required)
+
+    # --------------------------- Evaluación ---------------------------
+    def mask_for(self, claims: dict) -> int:
+        """Reduce los roles del token a los bits que alguna política usa; el resto se ignora."""
+        g = self._global_bits
+        mask = 0
+        for r in (claims.get("realm_access", {}) or {}).get("roles", []) or []:
+            mask |= g.get(str(r).strip().lower(), 0)
+        for client, obj in (claims.get("resource_access", {}) or {}).items():
+            scoped = self._client_bits.get(client)
+            for r in obj.get("roles", []) or []:
+                role = str(r).strip().lower()
+                mask |= g.get(role, 0)
+                if scoped:
+                    mask |= scoped.get(role, 0)
+        if "role" in claims:
+            mask |= g.get(str(claims["role"]).strip().lower(), 0)
+        for p in claims.get("permissions", []) or []:
+            mask |= g.get(str(p).strip().lower(), 0)
+        return mask
+
+    def allows(self, route: str, mask: int) -> bool:
+        policy = self.routes.get(route)
+        return policy is not None and policy.allows(mask)
+
+    def required(self, route: str) -> list[str]:
+        policy = self.routes.get(route)
+        return list(policy.required) if policy else []
+
+
+def default_policies(required_permission: str) -> dict:
+    """Equivalente a la regla histórica: REQUIRED_PERMISSION o el rol GerenteCuenta."""
+    rule = {"any_of": [required_permission, "GerenteCuenta"]}
+    return {"routes": {"historial": rule, "historial_batch": rule}}
+
+
+def load_policies(path: str | None, required_permission: str) -> PolicyEngine:
+    if not path:
+        return PolicyEngine(default_policies(required_permission))
+    with open(path, encoding="utf-8") as f:
+        return PolicyEngine(json.load(f))
@@ -0,0 +1,199 @@
+# resilience.py
+# Protección de la capacidad del Autorizador ante un upstream lento o caído
+# - CircuitBreaker: tasa de error y de llamadas lentas en una ventana móvil;
+#   abierto = falla rápido (503) sin ocupar hilos; semiabierto = pocas sondas
+# - AdaptiveLimiter: límite de llamadas en vuelo estilo AIMD
+#   (suma 1/limit por éxito rápido, multiplica por backoff ante error o lentitud)
+
+import threading
+import time
+from collections import deque
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+
+class UpstreamRejected(Exception):
+    """El upstream no se llama: breaker abierto o límite de concurrencia alcanzado."""
+
+    def __init__(self, reason: str, retry_after: float = 1.0):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    def __init__(self, window_sec: float = 30.0, min_requests: int = 20, error_rate: float = 0.5,
+                 slow_call_ms: float = 2000.0, slow_rate: float = 0.8, open_sec: float = 15.0,
+                 half_open_probes: int = 3, clock=time.monotonic):
+        self.window_sec = window_sec
+        self.min_requests = min_requests
+        self.error_rate = error_rate
+        self.slow_call_ms = slow_call_ms
+        self.slow_rate = slow_rate
+        self.open_sec = open_sec
+        self.half_open_probes = half_open_probes
+        self._clock = clock
+
+        self._lock = threading.Lock()
+        self._calls: deque = deque()   # (ts, ok, slow)
+        self._errors = 0
+        self._slow = 0
+        self.state = CLOSED
+        self._open_until = 0.0
+        self._probes_in_flight = 0
+        self._probes_ok = 0
+        self.opened_count = 0
+        self.rejected = 0
+
+    def allow(self) -> bool:
+        with self._lock:
+            now = self._clock()
+            if self.state == OPEN:
+                if now < self._open_until:
+                    self.rejected += 1
+                    return False
+                self.state = HALF_OPEN
+                self._probes_in_flight = 0
+                self._probes_ok = 0
+            if self.state == HALF_OPEN:
+                if self._probes_in_flight >= self.half_open_probes:
+                    self.rejected += 1
+                    return False
+                self._probes_in_flight += 1
+            return True
+
+    def record(self, ok: bool, latency_ms: float) -> None:
+        slow = latency_ms >= self.slow_call_ms
+        with self._lock:
+            now = self._clock()
+            if self.state == HALF_OPEN:
+                self._probes_in_flight = max(0, self._probes_in_flight - 1)
+                if not ok or slow:
+                    self._trip(now)
+                else:
+                    self._probes_ok += 1
+                    if self._probes_ok >= self.half_open_probes:
+                        self.state = CLOSED
+                        self._reset_window()
+                return
+            if self.state == OPEN:
+                return
+
+            self._calls.append((now, ok, slow))
+            self._errors += not ok
+            self._slow += slow
+            self._prune(now)
+            total = len(self._calls)
+            if total >= self.min_requests and (
+                self._errors / total >= self.error_rate or self._slow / total >= self.slow_rate
+            ):
+                self._trip(now)
+
+    def cancel(self) -> None:
+        """La llamada concedida por allow() no llegó a ejecutarse: no cuenta como resultado."""
+        with self._lock:
+            if self.state == HALF_OPEN:
+                self._probes_in_flight = max(0, self._probes_in_flight - 1)
+
+    def retry_after(self) -> float:
+        return max(0.0, self._open_until - self._clock())
+
+    def stats(self) -> dict:
+        with self._lock:
+            self._prune(self._clock())
+            total = len(self._calls)
+            return {
+                "state": self.state,
+                "window_calls": total,
+                "error_rate": round(self._errors / total, 4) if total else 0.0,
+                "slow_rate": round(self._slow / total, 4) if total else 0.0,
+                "opened_count": self.opened_count,
+                "rejected": self.rejected,
+                "retry_after": round(self.retry_after(), 1) if self.state == OPEN else 0,
+            }
+
+    def _trip(self, now: float) -> None:
+        self.state = OPEN
+        self._open_until = now + self.open_sec
+        self.opened_count += 1
+        self._reset_window()
+
+    def _reset_window(self) -> None:
+        self._calls.clear()
+        self._errors = 0
+        self._slow = 0
+
+    def _prune(self, now: float) -> None:
+        limit = now - self.window_sec
+        while self._calls and self._calls[0][0] < limit:
+            _, ok, slow = self._calls.popleft()
+            self._errors -= not ok
+            self._slow -= slow
+
+
+class AdaptiveLimiter:
+    def __init__(self, initial: int = 20, min_limit: int = 2, max_limit: int = 200,
+                 target_ms: float = 1000.0, backoff: float = 0.7):
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.target_ms = target_ms
+        self.backoff = backoff
+        self._limit = float(max(min_limit, min(initial, max_limit)))
+        self._in_flight = 0
+        self._lock = threading.Lock()
+        self.rejected = 0
+
+    @property
+    def limit(self) -> int:
+        return int(self._limit)
+
+    def try_acquire(self) -> bool:
+        with self._lock:
+            if self._in_flight >= int(self._limit):
+                self.rejected += 1
+                return False
+            self._in_flight += 1
+            return True
+
+    def release(self, ok: bool, latency_ms: float) -> None:
+        with self._lock:
+            self._in_flight -= 1
+            if ok and latency_ms <= self.target_ms:
+                self._limit = min(self.max_limit, self._limit + 1.0 / self._limit)
+            else:
+                self._limit = max(self.min_limit, self._limit * self.backoff)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "limit": int(self._limit),
+                "in_flight": self._in_flight,
+                "min_limit": self.min_limit,
+                "max_limit": self.max_limit,
+                "target_ms": self.target_ms,
+                "rejected": self.rejected,
+            }
+
+
+class UpstreamGuard:
+    """Breaker + limitador para un upstream; acquire() lanza UpstreamRejected si no hay paso."""
+
+    def __init__(self, breaker: CircuitBreaker, limiter: AdaptiveLimiter):
+        self.breaker = breaker
+        self.limiter = limiter
+
+    def acquire(self) -> float:
+        if not self.breaker.allow():
+            raise UpstreamRejected("circuit_open", retry_after=max(1.0, self.breaker.retry_after()))
+        if not self.limiter.try_acquire():
+            self.breaker.cancel()
+            raise UpstreamRejected("concurrency_limit")
+        return time.perf_counter()
+
+    def release(self, started: float, ok: bool) -> None:
+        latency_ms = (time.perf_counter() - started) * 1000.0
+        self.limiter.release(ok, latency_ms)
+        self.breaker.record(ok, latency_ms)
+
+    def stats(self) -> dict:
+        return {"breaker": self.breaker.stats(), "limiter": self.limiter.stats()}
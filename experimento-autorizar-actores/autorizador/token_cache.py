@@ -0,0 +1,111 @@
+# token_cache.py
+# Cache de tokens ya verificados para el Autorizador
+# - Clave: SHA-256 del token (nunca se guarda el bearer en claro)
+# - Valor: claims verificados + máscara de roles compilada por el PolicyEngine
+# - Expira cada entrada en exp - CLOCK_SKEW; expulsión LRU bajo un tope de memoria
+# - Thread-safe (gunicorn gthread) y con contadores de hit/miss
+
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+
+
+class CachedAuth:
+    """Resultado de una verificación RS256 reutilizable mientras el token no expire."""
+
+    __slots__ = ("claims", "mask", "expires_at", "size")
+
+    def __init__(self, claims: dict, mask: int, expires_at: float, size: int):
+        self.claims = claims
+        self.mask = mask
+        self.expires_at = expires_at
+        self.size = size
+
+
+class VerifiedTokenCache:
+    """LRU acotado por bytes aproximados; las entradas vencidas se descartan al leerlas."""
+
+    # Sobrecosto aproximado por entrada (clave, objeto, nodo del OrderedDict)
+    ENTRY_OVERHEAD = 256
+
+    def __init__(self, max_bytes: int, clock_skew: int = 0, clock=time.time):
+        self.max_bytes = max_bytes
+        self.clock_skew = clock_skew
+        self._clock = clock
+        self._entries: "OrderedDict[bytes, CachedAuth]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    @staticmethod
+    def key_for(token: str) -> bytes:
+        return hashlib.sha256(token.encode("utf-8")).digest()
+
+    def get(self, token: str) -> CachedAuth | None:
+        key = self.key_for(token)
+        now = self._clock()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            if entry.expires_at <= now:
+                self._drop(key)
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, token: str, claims: dict, mask: int) -> CachedAuth | None:
+        exp = claims.get("exp")
+        if not isinstance(exp, (int, float)):
+            return None
+        expires_at = float(exp) - self.clock_skew
+        if expires_at <= self._clock():
+            return None
+        size = self.ENTRY_OVERHEAD + len(json.dumps(claims, default=str)) + mask.bit_length() // 8
+        if size > self.max_bytes:
+            return None
+
+        entry = CachedAuth(claims, mask, expires_at, size)
+        key = self.key_for(token)
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = entry
+            self._bytes += size
+            while self._bytes > self.max_bytes and self._entries:
+                oldest = next(iter(self._entries))
+                self._drop(oldest)
+                self.evictions += 1
+        return entry
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / total, 4) if total else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+
+    def _drop(self, key: bytes) -> None:
+        entry = self._entries.pop(key)
+        self._bytes -= entry.size
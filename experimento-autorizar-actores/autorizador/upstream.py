@@ -0,0 +1,116 @@
+# upstream.py
+# Cliente HTTP hacia el micro de historial
+# - Una sesión keep-alive por worker (pool de conexiones de urllib3)
+# - Timeouts separados de conexión y lectura
+# - Reintentos acotados solo para GET (idempotente) ante resets de conexión
+# - (Opcional) UpstreamGuard: circuit breaker + límite adaptativo de llamadas en vuelo
+
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import ReadTimeoutError
+from urllib3.util.retry import Retry
+
+from resilience import UpstreamGuard
+
+
+class ConnectionRetry(Retry):
+    """
+    Reintenta fallos de conexión y resets (ProtocolError, p. ej. keep-alive cerrado por el
+    servidor), pero nunca un read timeout: el historial ya está lento y reintentar
+    multiplicaría el tiempo que el hilo queda ocupado.
+    """
+
+    def increment(self, method=None, url=None, response=None, error=None, _pool=None, _stacktrace=None):
+        if isinstance(error, ReadTimeoutError):
+            # Igual que Retry con read=False: se relanza el error original (requests -> ReadTimeout)
+            raise error.with_traceback(_stacktrace)
+        return super().increment(method, url, response, error, _pool, _stacktrace)
+
+
+class UpstreamClient:
+    """Sesión con pool compartida por los hilos del worker."""
+
+    def __init__(self, base_url: str, pool_size: int = 10, connect_timeout: float = 3.0,
+                 read_timeout: float = 10.0, retries: int = 2, backoff: float = 0.1,
+                 guard: UpstreamGuard | None = None):
+        self.base_url = base_url.rstrip("/")
+        self.guard = guard
+        self.pool_size = pool_size
+        self.timeout = (connect_timeout, read_timeout)
+        self.retries = retries
+
+        retry = ConnectionRetry(
+            total=retries,
+            connect=retries,
+            read=retries,
+            status=0,
+            backoff_factor=backoff,
+            allowed_methods=frozenset({"GET"}),
+            raise_on_status=False,
+        )
+        self._adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size,
+                                    max_retries=retry, pool_block=False)
+        self.session = requests.Session()
+        self.session.mount("http://", self._adapter)
+        self.session.mount("https://", self._adapter)
+
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._requests = 0
+
+    def get(self, path: str, headers: dict | None = None, **kwargs) -> requests.Response:
+        return self.request("GET", path, headers=headers, **kwargs)
+
+    def post(self, path: str, headers: dict | None = None, **kwargs) -> requests.Response:
+        # POST no se reintenta (ver allowed_methods del Retry)
+        return self.request("POST", path, headers=headers, **kwargs)
+
+    def request(self, method: str, path: str, headers: dict | None = None, **kwargs) -> requests.Response:
+        kwargs.setdefault("timeout", self.timeout)
+        started = self.guard.acquire() if self.guard else None
+        ok = False
+        with self._lock:
+            self._in_flight += 1
+            self._requests += 1
+        try:
+            r = self.session.request(method, f"{self.base_url}{path}", headers=headers, **kwargs)
+            ok = r.status_code < 500
+            return r
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+            if self.guard:
+                self.guard.release(started, ok)
+
+    def stats(self) -> dict:
+        pools = []
+        container = self._adapter.poolmanager.pools
+        for key in container.keys():
+            pool = container.get(key)
+            if pool is None:
+                continue
+            created = pool.num_connections
+            served = pool.num_requests
+            pools.append({
+                "host": f"{key.key_scheme}://{key.key_host}:{key.key_port}",
+                "connections_created": created,
+                "requests_sent": served,
+                # la cola de urllib3 se rellena con None; solo cuentan conexiones reales
+                "idle": sum(1 for c in list(pool.pool.queue) if c is not None) if pool.pool is not None else 0,
+                "reuse_ratio": round(1 - created / served, 4) if served else 0.0,
+            })
+        with self._lock:
+            in_flight, total = self._in_flight, self._requests
+        return {
+            "base_url": self.base_url,
+            "pool_size": self.pool_size,
+            "connect_timeout": self.timeout[0],
+            "read_timeout": self.timeout[1],
+            "retries": self.retries,
+            "in_flight": in_flight,
+            "requests": total,
+            "pools": pools,
+            **(self.guard.stats() if self.guard else {}),
+        }
@@ -0,0 +1,83 @@
+# upstream_async.py
+# Cliente HTTP asíncrono hacia el micro de historial (modo ASGI)
+# - Un httpx.AsyncClient por proceso con pool keep-alive compartido
+# - Timeouts separados de conexión y lectura; reintentos solo de conexión
+# - (Opcional) UpstreamGuard compartido con el modo síncrono
+
+import httpx
+
+from resilience import UpstreamGuard
+
+
+class AsyncUpstreamClient:
+    """Pool asíncrono; se abre/cierra con el ciclo de vida del servidor ASGI."""
+
+    def __init__(self, base_url: str, max_connections: int = 100, max_keepalive: int = 20,
+                 connect_timeout: float = 3.0, read_timeout: float = 10.0, retries: int = 2,
+                 guard: UpstreamGuard | None = None):
+        self.base_url = base_url.rstrip("/")
+        self.guard = guard
+        self.max_connections = max_connections
+        self.max_keepalive = max_keepalive
+        self.timeout = httpx.Timeout(read_timeout, connect=connect_timeout)
+        self.retries = retries
+        self._client: httpx.AsyncClient | None = None
+        self._in_flight = 0
+        self._requests = 0
+
+    async def start(self) -> None:
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                timeout=self.timeout,
+                limits=httpx.Limits(max_connections=self.max_connections,
+                                    max_keepalive_connections=self.max_keepalive),
+                transport=httpx.AsyncHTTPTransport(retries=self.retries),
+            )
+
+    async def close(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def get(self, path: str, headers: dict | None = None) -> httpx.Response:
+        return await self.request("GET", path, headers=headers)
+
+    async def post(self, path: str, headers: dict | None = None, json=None) -> httpx.Response:
+        return await self.request("POST", path, headers=headers, json=json)
+
+    async def request(self, method: str, path: str, headers: dict | None = None, **kwargs) -> httpx.Response:
+        req = self._client.build_request(method, path, headers=headers, **kwargs)
+        return await self._send(req, stream=False)
+
+    async def stream(self, path: str, headers: dict | None = None) -> httpx.Response:
+        """Devuelve la respuesta con el cuerpo sin leer; el llamador debe cerrarla (aclose)."""
+        req = self._client.build_request("GET", path, headers=headers)
+        return await self._send(req, stream=True)
+
+    async def _send(self, req: httpx.Request, stream: bool) -> httpx.Response:
+        started = self.guard.acquire() if self.guard else None
+        ok = False
+        self._in_flight += 1
+        self._requests += 1
+        try:
+            r = await self._client.send(req, stream=stream)
+            ok = r.status_code < 500
+            return r
+        finally:
+            self._in_flight -= 1
+            if self.guard:
+                self.guard.release(started, ok)
+
+    def stats(self) -> dict:
+        return {
+            "base_url": self.base_url,
+            "max_connections": self.max_connections,
+            "max_keepalive": self.max_keepalive,
+            "connect_timeout": self.timeout.connect,
+            "read_timeout": self.timeout.read,
+            "retries": self.retries,
+            "in_flight": self._in_flight,
+            "requests": self._requests,
+            **(self.guard.stats() if self.guard else {}),
+        }
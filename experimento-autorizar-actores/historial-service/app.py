@@ -1,10 +1,21 @@
+import os
 from flask import Flask, jsonify, request, abort
 
 app = Flask(__name__)
 
+BATCH_MAX_IDS = int(os.getenv("BATCH_MAX_IDS", "100"))
+
 @app.get("/ping")
 def health(): return jsonify({"status":"ok"}), 200
 
+def _historial(cliente_id, user_id):
+    # Demo de payload protegido
+    return {
+        "clienteId": cliente_id,
+        "resumen": "Historial clínico simulado",
+        "visiblePara": user_id
+    }
+
 @app.get("/historial/<cliente_id>")
 def get_historial(cliente_id):
     # Defensa en profundidad: debe venir del autorizador
@@ -12,13 +23,23 @@ def get_historial(cliente_id):
         return jsonify({"error":"auth_not_validated"}), 403
 
     user_id = request.headers.get("X-User-Id","unknown")
-    # Demo de payload protegido
-    data = {
-        "clienteId": cliente_id,
-        "resumen": "Historial clínico simulado",
-        "visiblePara": user_id
-    }
-    return jsonify(data), 200
+    return jsonify(_historial(cliente_id, user_id)), 200
+
+@app.post("/historial:batch")
+def get_historial_batch():
+    # Mismo contrato por ítem que GET /historial/<cliente_id>, en una sola llamada
+    if request.headers.get("X-Auth-Validated","").lower() != "true":
+        return jsonify({"error":"auth_not_validated"}), 403
+
+    payload = request.get_json(silent=True)
+    ids = payload.get("clienteIds") if isinstance(payload, dict) else None
+    if (not isinstance(ids, list) or not ids or len(ids) > BATCH_MAX_IDS
+            or not all(isinstance(cid, str) for cid in ids)):
+        return jsonify({"error":"invalid_request","detail":f"clienteIds: lista de 1 a {BATCH_MAX_IDS} strings"}), 400
+
+    user_id = request.headers.get("X-User-Id","unknown")
+    items = [{"clienteId": cid, "status": 200, "body": _historial(cid, user_id)} for cid in ids]
+    return jsonify({"items": items, "count": len(items)}), 200
 
 if __name__ == "__main__":
     app.run(host="0.0.0.0", port=int(os.getenv("PORT","8080")))
@@ -0,0 +1,85 @@
+"""
+Benchmark del checksum canónico: función original (json.loads + json.dumps + sha256)
+contra canonical_json.canonical_hexdigest (orjson si está instalado), en MB/s y memoria
+pico por tamaño de payload (productos). La equivalencia byte a byte se prueba en
+tests/test_canonical_json.py.
+
+Uso:
+    python benchmarks/bench_canonical_json.py [--sizes 10 1000 100000]
+"""
+import argparse
+import hashlib
+import json
+import os
+import sys
+import timeit
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import canonical_json  # noqa: E402
+
+CONTENT_TYPE = "application/json"
+
+
+def legacy_canonical_json_bytes(raw_body: bytes, content_type: str) -> bytes:
+    """Copia literal de la implementación previa en main.py (referencia)."""
+    if "application/json" in (content_type or "").lower():
+        try:
+            data = json.loads(raw_body.decode("utf-8"))
+            canon = json.dumps(data, separators=(",", ":"), sort_keys=True, ensure_ascii=False)
+            return canon.encode("utf-8")
+        except Exception:
+            return raw_body
+    return raw_body
+
+
+def legacy_checksum(raw_body: bytes, content_type: str = CONTENT_TYPE) -> str:
+    return hashlib.sha256(legacy_canonical_json_bytes(raw_body, content_type)).hexdigest()
+
+
+# ------------------------------ Rendimiento -------------------------------
+def products_body(n: int) -> bytes:
+    items = [{
+        "sku": f"SKU-{i:08d}",
+        "name": f"Producto {i} 500mg",
+        "lot_number": f"LOT-{i % 5000:06d}",
+        "expiration_date": "2030-01-01",
+        "price": round(i * 1.37, 2),
+    } for i in range(n)]
+    return json.dumps({"products": items} if n % 2 else items, ensure_ascii=False).encode("utf-8")
+
+
+def peak_mb(fn, body: bytes) -> float:
+    tracemalloc.start()
+    fn(body)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak / 1e6
+
+
+def run_benchmark(sizes: list) -> None:
+    new = lambda body: canonical_json.canonical_hexdigest(body, CONTENT_TYPE)  # noqa: E731
+    print(f"orjson: {'sí' if canonical_json.orjson is not None else 'no (biblioteca estándar)'}")
+    print(f"{'productos':>9} | {'KB':>8} | {'original MB/s':>13} | {'nuevo MB/s':>10} | "
+          f"{'pico orig MB':>12} | {'pico nuevo MB':>13}")
+    for n in sizes:
+        body = products_body(n)
+        assert new(body) == legacy_checksum(body)
+        number = max(3, 2_000_000 // max(len(body), 1))
+        t_old = timeit.timeit(lambda: legacy_checksum(body), number=number) / number
+        t_new = timeit.timeit(lambda: new(body), number=number) / number
+        mb = len(body) / 1e6
+        print(f"{n:>9} | {len(body) / 1024:>8.1f} | {mb / t_old:>13.1f} | {mb / t_new:>10.1f} | "
+              f"{peak_mb(legacy_checksum, body):>12.2f} | {peak_mb(new, body):>13.2f}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1, 100, 1000, 10000, 100000])
+    args = parser.parse_args()
+    run_benchmark(args.sizes)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""
+Forma canónica de JSON para el checksum de integridad.
+
+La salida es byte a byte igual a
+    json.dumps(json.loads(body), separators=(",", ":"), sort_keys=True, ensure_ascii=False)
+(o el body tal cual si no es JSON o no parsea). Si orjson está instalado, el parseo y la
+codificación con keys ordenadas se hacen con orjson, y se vuelve a la biblioteca estándar
+en los casos en que ambos podrían diferir: floats en notación exponencial o menores que
+1e-4 (el formato del exponente cambia entre versiones de orjson y nunca coincide del todo
+con el de json), enteros de más de 64 bits (orjson los convierte a float y salen con
+exponente), NaN/Infinity y surrogates sueltos (orjson los rechaza). Al importar el módulo
+se comparan ambos caminos sobre SELF_CHECK_BODIES; si la versión instalada de orjson
+difiere en alguno, el camino rápido queda desactivado.
+El árbol que arma orjson.loads ocupa unas 3,5 veces más que el de json.loads, así que el
+camino rápido se limita a bodies de hasta FAST_PATH_MAX_BYTES; para payloads mayores
+conviene el modo sha256-raw.
+"""
+import hashlib
+import json
+import re
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - dependencia opcional
+    orjson = None
+
+# Un solo encoder reutilizable (json.dumps con opciones crea uno nuevo en cada llamada)
+_ENCODER = json.JSONEncoder(separators=(",", ":"), sort_keys=True, ensure_ascii=False)
+_encode = _ENCODER.encode
+
+# Tamaño máximo de body para el camino con orjson (memoria pico ~16x el body)
+FAST_PATH_MAX_BYTES = 4 * 1024 * 1024
+
+# Salida de orjson que la biblioteca estándar escribiría distinto: exponente ("1.5e-7" vs
+# "1.5e-07", "1e16" vs "1e+16"; según la versión de orjson con o sin signo) o decimal
+# pequeño ("0.00001" vs "1e-05"). Primero un filtro barato (una regex que empieza con un
+# literal y la búsqueda de un substring) y la regex exacta solo si alguno coincide; dentro
+# de strings también puede coincidir y entonces solo se pierde el camino rápido.
+_EXPONENT_MARKER = re.compile(rb"e[-+0-9]")
+_SMALL_DECIMAL_MARKER = b"0.0000"
+_FLOAT_FORMAT_RISK = re.compile(rb"\de[-+]?\d|0\.0000")
+
+# Bodies con los que se valida la versión instalada de orjson contra la biblioteca estándar:
+# en cada uno orjson tiene que dar los mismos bytes o ceder (devolver None)
+SELF_CHECK_BODIES = tuple(
+    b"[%s]" % number for number in (
+        b"1e16", b"1e15", b"1e22", b"1.5e-7", b"1e-5", b"1e-4", b"5e-324",
+        b"1.7976931348623157e308", b"18446744073709551616", b"-9223372036854775809",
+        b"12345678901234567890123",
+    )
+) + (
+    b'[0.1,100.0,-0.0,123.456,0.0001,9223372036854775807,-9223372036854775808,18446744073709551615]',
+    b'{"z":1,"\\u00e9":2,"a":{"\\ud83d\\ude00":3,"\\uffff":4,"A":5},"":null}',
+    '["\\u2028","\\u007f","\\u0000","ñ","中","😀","</","\\"",true,false]'.encode("utf-8"),
+)
+
+
+def is_json(content_type: str) -> bool:
+    return "application/json" in (content_type or "").lower()
+
+
+def canonical_bytes(raw_body: bytes, content_type: str) -> bytes:
+    """Si es JSON, la forma canónica completa en bytes; si no (o no parsea), el body tal cual."""
+    if not is_json(content_type):
+        return raw_body
+    if orjson is not None and FAST_PATH_ENABLED and len(raw_body) <= FAST_PATH_MAX_BYTES:
+        canonical = _orjson_canonical(raw_body)
+        if canonical is not None:
+            return canonical
+    return _stdlib_canonical(raw_body)
+
+
+def canonical_hexdigest(raw_body: bytes, content_type: str, new_hash=hashlib.sha256) -> str:
+    """Checksum de canonical_bytes(raw_body, content_type) con la fábrica de hash dada."""
+    h = new_hash()
+    h.update(canonical_bytes(raw_body, content_type))
+    return h.hexdigest()
+
+
+def object_hexdigest(obj, new_hash=hashlib.sha256) -> str:
+    """
+    Checksum de la forma canónica de un valor ya parseado con json (p. ej. un ítem de un lote).
+    Siempre con la biblioteca estándar: el valor puede traer NaN, que orjson escribiría como null.
+    """
+    h = new_hash()
+    h.update(_encode(obj).encode("utf-8"))
+    return h.hexdigest()
+
+
+def _stdlib_canonical(raw_body: bytes) -> bytes:
+    """Camino de referencia (el comportamiento original)."""
+    try:
+        return _encode(json.loads(raw_body.decode("utf-8"))).encode("utf-8")
+    except Exception:
+        return raw_body
+
+
+def _orjson_canonical(raw_body: bytes):
+    """Forma canónica con orjson, o None si el resultado podría diferir del de referencia."""
+    try:
+        canonical = orjson.dumps(orjson.loads(raw_body), option=orjson.OPT_SORT_KEYS)
+    except (orjson.JSONDecodeError, orjson.JSONEncodeError):
+        return None
+    maybe_risky = _SMALL_DECIMAL_MARKER in canonical or _EXPONENT_MARKER.search(canonical)
+    if maybe_risky and _FLOAT_FORMAT_RISK.search(canonical):
+        return None
+    return canonical
+
+
+def _fast_path_agrees() -> bool:
+    """True si orjson produce lo mismo que la biblioteca estándar (o cede) en SELF_CHECK_BODIES."""
+    return orjson is not None and all(
+        _orjson_canonical(body) in (None, _stdlib_canonical(body)) for body in SELF_CHECK_BODIES
+    )
+
+
+FAST_PATH_ENABLED = _fast_path_agrees()
@@ -0,0 +1,117 @@
+"""
+Anillo de claves para la integridad firmada (HMAC-SHA256 y BLAKE2b con clave).
+
+Las claves se cargan una vez por instancia y quedan en memoria: ninguna petición
+consulta un gestor de secretos. Fuentes, en formato JSON {"<kid>": "<secreto>"}:
+    INTEGRITY_KEYS: variable de entorno (p. ej. secreto de Secret Manager expuesto como env)
+    INTEGRITY_KEYS_FILE: archivo (p. ej. secreto montado como volumen); se relee cuando
+        cambia su mtime, comprobado como máximo cada KEYRING_REFRESH_SEC segundos
+Un secreto puede ir como texto, "hex:<hex>" o "base64:<b64>". Para rotar, se publica
+un anillo con la clave nueva y la anterior, y se retira la anterior cuando los
+clientes ya firman con la nueva.
+"""
+import base64
+import json
+import logging
+import os
+import threading
+import time
+from typing import Dict, List, Mapping, Optional
+
+
+def parse_keys(text: str) -> Dict[str, bytes]:
+    """
+    Parsea un anillo {"<kid>": "<secreto>"}.
+
+    Args:
+        text: JSON del anillo
+
+    Returns:
+        Diccionario kid -> clave en bytes
+    """
+    data = json.loads(text) if text.strip() else {}
+    if not isinstance(data, dict):
+        raise ValueError("Key ring must be a JSON object {kid: secret}")
+    keys = {}
+    for kid, secret in data.items():
+        if not isinstance(secret, str) or not secret:
+            raise ValueError(f"Key {kid!r} must be a non-empty string")
+        if secret.startswith("hex:"):
+            keys[kid] = bytes.fromhex(secret[4:])
+        elif secret.startswith("base64:"):
+            keys[kid] = base64.b64decode(secret[7:], validate=True)
+        else:
+            keys[kid] = secret.encode("utf-8")
+    return keys
+
+
+class KeyRing:
+    """Claves por kid en memoria; el archivo, si hay, se recarga al cambiar (thread-safe)."""
+
+    def __init__(self, inline: str = "", path: str = "", refresh_interval: float = 30.0, clock=time.monotonic):
+        self.path = path
+        self.refresh_interval = refresh_interval
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._inline = parse_keys(inline) if inline else {}
+        self._file_keys: Dict[str, bytes] = {}
+        self._mtime: Optional[float] = None
+        self._next_check = 0.0
+        self._keys = dict(self._inline)
+        if path:
+            self._reload_if_changed()
+
+    def get(self, kid: str) -> Optional[bytes]:
+        """
+        Clave vigente para un kid.
+
+        Args:
+            kid: identificador de la clave enviado en el header
+
+        Returns:
+            Clave en bytes o None si el kid no está en el anillo
+        """
+        if self.path and self._clock() >= self._next_check and self._lock.acquire(blocking=False):
+            try:
+                self._reload_if_changed()
+            finally:
+                self._lock.release()
+        return self._keys.get(kid)
+
+    def kids(self) -> List[str]:
+        return sorted(self._keys)
+
+    def _reload_if_changed(self) -> None:
+        self._next_check = self._clock() + self.refresh_interval
+        try:
+            mtime = os.stat(self.path).st_mtime
+            if mtime == self._mtime:
+                return
+            with open(self.path, encoding="utf-8") as f:
+                self._file_keys = parse_keys(f.read())
+        except (OSError, ValueError) as e:
+            # Se conservan las claves cargadas: un archivo a medio escribir no deja la función sin claves
+            logging.warning("Key ring file %s not reloaded: %s", self.path, e)
+            return
+        self._mtime = mtime
+        # El archivo prevalece sobre la variable de entorno; se reemplaza el dict de una vez
+        self._keys = {**self._inline, **self._file_keys}
+        logging.info("Key ring loaded: kids=%s", self.kids())
+
+
+def key_ring_from_env(env: Optional[Mapping[str, str]] = None) -> KeyRing:
+    """
+    Construye el anillo desde INTEGRITY_KEYS, INTEGRITY_KEYS_FILE y KEYRING_REFRESH_SEC (30).
+
+    Args:
+        env: variables de entorno (por defecto os.environ)
+
+    Returns:
+        KeyRing cargado
+    """
+    env = os.environ if env is None else env
+    return KeyRing(
+        inline=env.get("INTEGRITY_KEYS", ""),
+        path=env.get("INTEGRITY_KEYS_FILE", ""),
+        refresh_interval=float(env.get("KEYRING_REFRESH_SEC", "30")),
+    )
@@ -1,9 +1,19 @@
 import os
 import json
+import functools
 import hashlib
+import hmac
 import logging
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
 import requests
 import functions_framework
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+import canonical_json
+import key_ring
 
 # ===== Config =====
 INVENTORY_BASE_URL = os.getenv(
@@ -13,7 +23,40 @@ INVENTORY_BASE_URL = os.getenv(
 FORWARD_PATH    = os.getenv("FORWARD_PATH", "/inventory/products")
 CHECKSUM_HEADER = os.getenv("CHECKSUM_HEADER", "X-Message-Integrity")
 CHECKSUM_ALGO   = os.getenv("CHECKSUM_ALGO", "sha256").lower()
-HTTP_TIMEOUT    = float(os.getenv("HTTP_TIMEOUT_SEC", "10"))
+# Timeouts (connect, read) hacia inventory-service; HTTP_TIMEOUT_SEC se mantiene como read por compatibilidad
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT_SEC", "3.05"))
+HTTP_READ_TIMEOUT    = float(os.getenv("HTTP_READ_TIMEOUT_SEC", os.getenv("HTTP_TIMEOUT_SEC", "10")))
+# Pool keep-alive y reintentos solo ante errores de conexión (el POST aún no se envió)
+HTTP_POOL_SIZE     = int(os.getenv("HTTP_POOL_SIZE", "16"))
+HTTP_RETRIES       = int(os.getenv("HTTP_CONNECT_RETRIES", "2"))
+HTTP_RETRY_BACKOFF = float(os.getenv("HTTP_RETRY_BACKOFF_SEC", "0.2"))
+# Reenvíos simultáneos por instancia (dentro de la petición) y espera máxima por un cupo antes de responder 503
+FORWARD_MAX_CONCURRENCY   = int(os.getenv("FORWARD_MAX_CONCURRENCY", str(HTTP_POOL_SIZE)))
+FORWARD_QUEUE_TIMEOUT_SEC = float(os.getenv("FORWARD_QUEUE_TIMEOUT_SEC", "5"))
+# Lotes: {"items": [{"checksum": "sha256=<hex>", "product": {...}}]} en BATCH_PATH, reenviados a BULK_FORWARD_PATH
+BATCH_PATH             = os.getenv("BATCH_PATH", "/batch")
+BULK_FORWARD_PATH      = os.getenv("BULK_FORWARD_PATH", "/inventory/products:bulk")
+BATCH_MAX_ITEMS        = int(os.getenv("BATCH_MAX_ITEMS", "50000"))
+# Verificación en paralelo (por bloques): el encoder JSON retiene el GIL, rinde solo con runtimes sin GIL
+BATCH_VERIFY_WORKERS   = int(os.getenv("BATCH_VERIFY_WORKERS", "1"))
+BATCH_PARALLEL_MIN     = int(os.getenv("BATCH_PARALLEL_MIN", "512"))
+BATCH_VERIFY_CHUNK     = int(os.getenv("BATCH_VERIFY_CHUNK", "256"))
+# Log de cada reenvío (URL, nombres de headers, tamaño y estado; nunca el body)
+DEBUG_FORWARDING = os.getenv("DEBUG_FORWARDING", "false").lower() == "true"
+# Modo raw ("sha256-raw=<hex>"): hash por bloques mientras se lee el body, sin parsear JSON
+STREAM_CHUNK_SIZE = int(os.getenv("STREAM_CHUNK_SIZE", str(64 * 1024)))
+SPOOL_MAX_MEMORY  = int(os.getenv("SPOOL_MAX_MEMORY", str(1024 * 1024)))
+
+CANONICAL_SCHEME = "sha256"
+RAW_SUFFIX       = "-raw"
+# Esquemas firmados "<algo>[-raw]:<kid>=<hex>" con la clave <kid> del anillo (INTEGRITY_KEYS / INTEGRITY_KEYS_FILE)
+KEYED_ALGOS = {
+    "hmac-sha256": lambda key: functools.partial(hmac.new, key, digestmod=hashlib.sha256),
+    "blake2b":     lambda key: functools.partial(hashlib.blake2b, key=key, digest_size=32),
+}
+# Rechaza los digest sin clave (sha256 / sha256-raw): solo se aceptan esquemas firmados
+REQUIRE_SIGNATURE = os.getenv("REQUIRE_SIGNATURE", "false").lower() == "true"
+KEY_RING = key_ring.key_ring_from_env()
 
 HOP_BY_HOP = {
     "connection","keep-alive","proxy-authenticate","proxy-authorization",
@@ -25,6 +68,46 @@ STRIP_HEADERS = {
     "x-cloud-trace-context", "traceparent", "forwarded", "function-execution-id",
 }
 
+def _build_session() -> requests.Session:
+    """Session compartida por la instancia: conexiones keep-alive reutilizadas entre invocaciones."""
+    retry = Retry(
+        total=HTTP_RETRIES, connect=HTTP_RETRIES, read=0, status=0, other=0,
+        backoff_factor=HTTP_RETRY_BACKOFF, raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=HTTP_POOL_SIZE, max_retries=retry)
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+SESSION = _build_session()
+
+# Logger propio: functions-framework no configura el root logger (queda en WARNING)
+log = logging.getLogger("cf-validador")
+if DEBUG_FORWARDING:
+    log.setLevel(logging.DEBUG)
+    if not log.handlers:
+        _handler = logging.StreamHandler()
+        _handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s %(message)s"))
+        log.addHandler(_handler)
+    log.propagate = False
+
+# Cupos de reenvío: con inventory-service lento las peticiones esperan un cupo en vez de acumularse
+_forward_slots = threading.BoundedSemaphore(FORWARD_MAX_CONCURRENCY)
+
+class ForwardSaturated(Exception):
+    """No hubo cupo de reenvío dentro de FORWARD_QUEUE_TIMEOUT_SEC."""
+
+# Hilos de la instancia para verificar lotes grandes
+_executors = {}
+_executor_lock = threading.Lock()
+
+def _get_executor(name: str, workers: int) -> ThreadPoolExecutor:
+    with _executor_lock:
+        if name not in _executors:
+            _executors[name] = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=name)
+        return _executors[name]
+
 def _cors_headers() -> dict:
     return {
         "Access-Control-Allow-Origin": "*",
@@ -33,28 +116,117 @@ def _cors_headers() -> dict:
         "Access-Control-Max-Age": "3600",
     }
 
-def _canonical_json_bytes(raw_body: bytes, content_type: str) -> bytes:
-    """Si es JSON, serializa de forma canónica (keys ordenadas, sin espacios)."""
-    if "application/json" in (content_type or "").lower():
-        try:
-            data = json.loads(raw_body.decode("utf-8"))
-            canon = json.dumps(data, separators=(",", ":"), sort_keys=True, ensure_ascii=False)
-            return canon.encode("utf-8")
-        except Exception:
-            return raw_body
-    return raw_body
-
-def _compute_checksum(raw: bytes) -> str:
+def _new_hash():
     if CHECKSUM_ALGO != "sha256":
         raise ValueError("Unsupported algorithm; only sha256 is supported.")
-    h = hashlib.sha256()
-    h.update(raw)
-    return h.hexdigest()
+    return hashlib.sha256()
 
 def _expected_from_header(v: str) -> str:
-    # Acepta "sha256=<hex>" o "<hex>"
+    # Acepta "sha256=<hex>", "sha256-raw=<hex>" o "<hex>"
     return (v or "").split("=", 1)[-1].strip()
 
+def _scheme_from_header(v: str) -> str:
+    """Esquema del header; sin prefijo se asume el modo canónico (compatibilidad)."""
+    if "=" not in (v or ""):
+        return CANONICAL_SCHEME
+    scheme = v.split("=", 1)[0].strip()
+    # El kid conserva mayúsculas; el algoritmo no distingue
+    algo, sep, kid = scheme.partition(":")
+    return algo.lower() + sep + kid
+
+class IntegrityError(Exception):
+    """Esquema o clave no utilizable: se responde con status y body sin calcular el hash."""
+
+    def __init__(self, status: int, body: dict):
+        super().__init__(body.get("error"))
+        self.status = status
+        self.body = body
+
+def _hasher_for(scheme: str) -> tuple:
+    """
+    Resuelve el esquema a (fábrica de hash, modo raw, firmado). La fábrica se usa igual
+    en streaming y en el modo canónico: la firma sale de la misma pasada de hash.
+    """
+    algo, _, kid = scheme.partition(":")
+    raw = algo.endswith(RAW_SUFFIX)
+    if raw:
+        algo = algo[:-len(RAW_SUFFIX)]
+    if algo == CANONICAL_SCHEME and not kid:
+        if REQUIRE_SIGNATURE:
+            raise IntegrityError(401, {"error": "Signed integrity required", "scheme": scheme})
+        return _new_hash, raw, False
+    if algo not in KEYED_ALGOS:
+        raise IntegrityError(400, {"error": "Unsupported integrity scheme", "scheme": scheme})
+    if not kid:
+        raise IntegrityError(400, {"error": "Missing key id", "scheme": scheme})
+    key = KEY_RING.get(kid)
+    if key is None:
+        raise IntegrityError(401, {"error": "Unknown key id", "kid": kid})
+    if algo == "blake2b" and len(key) > hashlib.blake2b.MAX_KEY_SIZE:
+        raise IntegrityError(400, {"error": "Key too long for blake2b", "kid": kid})
+    return KEYED_ALGOS[algo](key), raw, True
+
+def _digest_matches(actual: str, expected: str) -> bool:
+    # Comparación en tiempo constante (el header puede traer bytes no ASCII)
+    return hmac.compare_digest(actual.encode("ascii"), expected.encode("utf-8", "replace"))
+
+def _mismatch_body(expected: str, actual: str, keyed: bool) -> dict:
+    # En esquemas firmados no se devuelve el valor calculado: sería un oráculo de firmas
+    if keyed:
+        return {"error": "Integrity check failed"}
+    return {"error": "Integrity check failed", "expected": expected, "actual": actual}
+
+class _SpooledBody:
+    """
+    Body ya hasheado listo para reenviar: se lee por bloques y expone su longitud,
+    así requests envía Content-Length sin volcar a disco un spool que aún está en memoria.
+    """
+
+    def __init__(self, spool, size: int):
+        self._spool = spool
+        self._size = size
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __iter__(self):
+        while True:
+            chunk = self._spool.read(STREAM_CHUNK_SIZE)
+            if not chunk:
+                return
+            yield chunk
+
+    def read(self, size: int = -1) -> bytes:
+        return self._spool.read(size)
+
+    def tell(self) -> int:
+        return self._spool.tell()
+
+    def seek(self, offset: int, whence: int = 0) -> int:
+        return self._spool.seek(offset, whence)
+
+    def close(self) -> None:
+        self._spool.close()
+
+def _hash_stream(stream, new_hash=None) -> tuple:
+    """
+    Hashea el body por bloques de STREAM_CHUNK_SIZE mientras lo copia a un
+    SpooledTemporaryFile (en memoria hasta SPOOL_MAX_MEMORY, luego a disco).
+    Memoria constante sin importar el tamaño del payload.
+    """
+    h = (new_hash or _new_hash)()
+    spool = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_MEMORY)
+    size = 0
+    while True:
+        chunk = stream.read(STREAM_CHUNK_SIZE)
+        if not chunk:
+            break
+        h.update(chunk)
+        spool.write(chunk)
+        size += len(chunk)
+    spool.seek(0)
+    return _SpooledBody(spool, size), h.hexdigest()
+
 def _forward_headers(req, skip_header: str) -> dict:
     """Copia headers útiles, elimina hop-by-hop + problemáticos + header de integridad."""
     out = {}
@@ -74,6 +246,166 @@ def _forward_headers(req, skip_header: str) -> dict:
         out["X-Correlation-Id"] = req.headers["X-Correlation-Id"]
     return out
 
+def _body_size(body) -> int:
+    return len(body) if body is not None else 0
+
+def _forward(url: str, body, headers: dict) -> requests.Response:
+    """
+    POST a inventory-service por la session con pool, dentro de la petición y con
+    concurrencia acotada; el cliente recibe siempre el resultado real del upstream.
+    """
+    if not _forward_slots.acquire(timeout=FORWARD_QUEUE_TIMEOUT_SEC):
+        raise ForwardSaturated()
+    try:
+        log.debug("Forwarding to %s headers=%s body_bytes=%d", url, sorted(headers), _body_size(body))
+        resp = SESSION.post(url, data=body, headers=headers, timeout=(HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT))
+        log.debug("Upstream %s -> %d in %.1f ms", url, resp.status_code, resp.elapsed.total_seconds() * 1000)
+        return resp
+    finally:
+        _forward_slots.release()
+
+def _saturated_response(cors: dict, extra: dict = None) -> tuple:
+    body = {"error": "Forwarding saturated, retry later", **(extra or {})}
+    return (json.dumps(body), 503, {"Content-Type": "application/json", "Retry-After": "1", **cors})
+
+def _verify_item(item) -> tuple:
+    """(product, None) si el checksum del ítem coincide con su producto canónico; si no, (None, error)."""
+    if not isinstance(item, dict) or not isinstance(item.get("product"), dict):
+        return None, {"status": "invalid", "error": "Item must be {checksum, product}"}
+    checksum = item.get("checksum")
+    if not isinstance(checksum, str) or not checksum:
+        return None, {"status": "invalid", "error": "Missing checksum"}
+    scheme = _scheme_from_header(checksum)
+    try:
+        new_hash, raw, keyed = _hasher_for(scheme)
+    except IntegrityError as e:
+        return None, {"status": "invalid", **e.body}
+    if raw:
+        # Los bytes originales del ítem no se conservan dentro del lote: solo el modo canónico
+        return None, {"status": "invalid", "error": "Unsupported integrity scheme", "scheme": scheme}
+    expected = _expected_from_header(checksum)
+    try:
+        actual = canonical_json.object_hexdigest(item["product"], new_hash)
+    except ValueError:
+        # Surrogates sueltos: el producto no tiene forma canónica en UTF-8
+        return None, {"status": "invalid", "error": "Product is not valid UTF-8 JSON"}
+    if not _digest_matches(actual, expected):
+        mismatch = _mismatch_body(expected, actual, keyed)
+        mismatch.pop("error")
+        return None, {"status": "integrity_failed", **mismatch}
+    return item["product"], None
+
+def _item_sku(item):
+    product = item.get("product") if isinstance(item, dict) else None
+    return product.get("sku") if isinstance(product, dict) else None
+
+def _verify_chunk(items: list) -> list:
+    return [_verify_item(item) for item in items]
+
+def _verify_items(items: list) -> list:
+    """Verifica cada ítem; los lotes grandes se reparten por bloques en el pool de verificación."""
+    if len(items) < BATCH_PARALLEL_MIN or BATCH_VERIFY_WORKERS <= 1:
+        return _verify_chunk(items)
+    executor = _get_executor("verify", BATCH_VERIFY_WORKERS)
+    chunks = [items[i:i + BATCH_VERIFY_CHUNK] for i in range(0, len(items), BATCH_VERIFY_CHUNK)]
+    return [verdict for chunk in executor.map(_verify_chunk, chunks) for verdict in chunk]
+
+def _merge_upstream_results(results: list, valid_indexes: list, upstream) -> None:
+    """Traslada los resultados del bulk (índices del subconjunto válido) a los índices del lote."""
+    if not isinstance(upstream, dict) or not isinstance(upstream.get("results"), list):
+        return
+    for upstream_result in upstream["results"]:
+        position = upstream_result.get("index") if isinstance(upstream_result, dict) else None
+        if not isinstance(position, int) or not 0 <= position < len(valid_indexes):
+            continue
+        result = results[valid_indexes[position]]
+        result["status"] = upstream_result.get("status")
+        if upstream_result.get("error"):
+            result["error"] = upstream_result["error"]
+        superseded_by = upstream_result.get("superseded_by")
+        if isinstance(superseded_by, int) and 0 <= superseded_by < len(valid_indexes):
+            result["superseded_by"] = valid_indexes[superseded_by]
+
+def _batch_summary(results: list) -> dict:
+    counts = {}
+    for result in results:
+        counts[result["status"]] = counts.get(result["status"], 0) + 1
+    return {"results": results, "count": len(results), "counts": counts}
+
+def _validate_batch(request, cors: dict):
+    """
+    Lote con checksum por ítem: verifica todos, reporta los fallos por índice y reenvía
+    solo los válidos a inventory-service en una única llamada bulk.
+    """
+    json_headers = {"Content-Type": "application/json", **cors}
+    raw_body = request.get_data(cache=False, as_text=False)
+
+    # El header de integridad es opcional en lotes; si viene, cubre el sobre completo
+    header_val = request.headers.get(CHECKSUM_HEADER, "")
+    if header_val:
+        try:
+            new_hash, raw, keyed = _hasher_for(_scheme_from_header(header_val))
+        except IntegrityError as e:
+            return (json.dumps(e.body), e.status, json_headers)
+        if raw:
+            h = new_hash()
+            h.update(raw_body)
+            actual = h.hexdigest()
+        else:
+            actual = canonical_json.canonical_hexdigest(raw_body, "application/json", new_hash)
+        expected = _expected_from_header(header_val)
+        if not _digest_matches(actual, expected):
+            return (json.dumps(_mismatch_body(expected, actual, keyed)), 400, json_headers)
+
+    try:
+        envelope = json.loads(raw_body.decode("utf-8"))
+    except Exception:
+        return (json.dumps({"error": "Invalid JSON"}), 400, json_headers)
+    items = envelope.get("items") if isinstance(envelope, dict) else None
+    if not isinstance(items, list) or not items:
+        return (json.dumps({"error": "Body must be {\"items\": [...]} with at least one item"}), 400, json_headers)
+    if len(items) > BATCH_MAX_ITEMS:
+        return (json.dumps({"error": f"Batch exceeds {BATCH_MAX_ITEMS} items"}), 413, json_headers)
+
+    results, products, valid_indexes = [], [], []
+    for index, (item, (product, error)) in enumerate(zip(items, _verify_items(items))):
+        result = {"index": index, "sku": product.get("sku") if product else _item_sku(item)}
+        if error:
+            result.update(error)
+        else:
+            result["status"] = "verified"
+            products.append(product)
+            valid_indexes.append(index)
+        results.append(result)
+
+    if not products or not INVENTORY_BASE_URL:
+        return (json.dumps(_batch_summary(results)), 200 if products else 422, json_headers)
+
+    url = INVENTORY_BASE_URL + BULK_FORWARD_PATH
+    headers = _forward_headers(request, CHECKSUM_HEADER)
+    bulk_body = json.dumps({"products": products}, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+    try:
+        resp = _forward(url, bulk_body, headers)
+    except ForwardSaturated:
+        return _saturated_response(cors, _batch_summary(results))
+    except requests.RequestException as e:
+        log.exception("Proxy error")
+        body = {"error": "Upstream error", "detail": str(e), **_batch_summary(results)}
+        return (json.dumps(body), 502, json_headers)
+
+    try:
+        upstream = resp.json()
+    except ValueError:
+        upstream = None
+    if resp.status_code != 200:
+        body = {"error": "Upstream rejected batch", "upstream_status": resp.status_code,
+                "upstream": upstream, **_batch_summary(results)}
+        return (json.dumps(body), 502 if resp.status_code >= 500 else resp.status_code, json_headers)
+
+    _merge_upstream_results(results, valid_indexes, upstream)
+    return (json.dumps(_batch_summary(results)), 200, json_headers)
+
 @functions_framework.http
 def validador_mediador(request):
     
@@ -82,6 +414,9 @@ def validador_mediador(request):
 
     cors = {"Access-Control-Allow-Origin": "*"}
 
+    if request.path.rstrip("/").endswith(BATCH_PATH):
+        return _validate_batch(request, cors)
+
     # 1) Header de integridad
     header_val = request.headers.get(CHECKSUM_HEADER, "")
     if not header_val:
@@ -89,14 +424,23 @@ def validador_mediador(request):
         return (json.dumps(body), 400, {"Content-Type": "application/json", **cors})
 
     expected = _expected_from_header(header_val)
+    try:
+        new_hash, raw, keyed = _hasher_for(_scheme_from_header(header_val))
+    except IntegrityError as e:
+        return (json.dumps(e.body), e.status, {"Content-Type": "application/json", **cors})
 
-    # 2) Checksum del body canónico
-    raw_body = request.get_data(cache=False, as_text=False)
-    content_type = request.headers.get("Content-Type", "")
-    actual = _compute_checksum(_canonical_json_bytes(raw_body, content_type))
+    # 2) Checksum o firma: bytes tal cual llegan (raw, en streaming) o del body canónico
+    if raw:
+        raw_body, actual = _hash_stream(request.stream, new_hash)
+    else:
+        raw_body = request.get_data(cache=False, as_text=False)
+        content_type = request.headers.get("Content-Type", "")
+        actual = canonical_json.canonical_hexdigest(raw_body, content_type, new_hash)
 
-    if actual != expected:
-        body = {"error": "Integrity check failed", "expected": expected, "actual": actual}
+    if not _digest_matches(actual, expected):
+        if isinstance(raw_body, _SpooledBody):
+            raw_body.close()
+        body = _mismatch_body(expected, actual, keyed)
         return (json.dumps(body), 400, {"Content-Type": "application/json", **cors})
 
     # 3) Reenviar al servicio de inventario
@@ -108,15 +452,21 @@ def validador_mediador(request):
     headers = _forward_headers(request, CHECKSUM_HEADER)
 
     try:
-        print(f"Forwarding to {url} with headers {headers} and body {raw_body!r}")
-        resp = requests.post(url, data=raw_body, headers=headers, timeout=HTTP_TIMEOUT)
-      
+        resp = _forward(url, raw_body, headers)
+
         out_headers = {"Content-Type": resp.headers.get("Content-Type", "application/json"), **cors}
         if "Location" in resp.headers:
             out_headers["Location"] = resp.headers["Location"]
         return (resp.content, resp.status_code, out_headers)
 
+    except ForwardSaturated:
+        return _saturated_response(cors)
+
     except requests.RequestException as e:
-        logging.exception("Proxy error")
+        log.exception("Proxy error")
         body = {"error": "Upstream error", "detail": str(e)}
         return (json.dumps(body), 502, {"Content-Type": "application/json", **cors})
+
+    finally:
+        if isinstance(raw_body, _SpooledBody):
+            raw_body.close()
@@ -0,0 +1,186 @@
+"""
+Equivalencia de canonical_json con la implementación original del checksum
+(json.loads + json.dumps con keys ordenadas, sin espacios y ensure_ascii=False).
+
+Uso (desde cf-validador/):
+    python -m unittest discover -s tests
+    CANONICAL_CASES=20000 python -m unittest discover -s tests
+"""
+import hashlib
+import json
+import os
+import random
+import re
+import sys
+import types
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import canonical_json  # noqa: E402
+
+CONTENT_TYPE = "application/json"
+CASES = int(os.getenv("CANONICAL_CASES", "3000"))
+SEED = int(os.getenv("CANONICAL_SEED", "1234"))
+
+ALPHABET = "abcXYZ019eE. _-\"\\/\n\t\x00\x1f\x7fñé中 \U0001f600"
+
+
+def legacy_canonical_json_bytes(raw_body: bytes, content_type: str) -> bytes:
+    """Copia literal de la implementación previa en main.py (referencia)."""
+    if "application/json" in (content_type or "").lower():
+        try:
+            data = json.loads(raw_body.decode("utf-8"))
+            canon = json.dumps(data, separators=(",", ":"), sort_keys=True, ensure_ascii=False)
+            return canon.encode("utf-8")
+        except Exception:
+            return raw_body
+    return raw_body
+
+
+def random_string(rng: random.Random) -> str:
+    return "".join(rng.choice(ALPHABET) for _ in range(rng.randint(0, 12)))
+
+
+def random_number(rng: random.Random):
+    kind = rng.randint(0, 5)
+    if kind == 0:
+        return rng.randint(-10**20, 10**20)
+    if kind == 1:
+        return rng.randint(-2**63, 2**64)
+    if kind == 2:
+        return rng.choice([0.0, -0.0, 1e16, 1e15, 1.5e-7, 1e-4, 1e-5, 123.456, 5e-324, 1.7976931348623157e308])
+    if kind == 3:
+        return rng.uniform(-1e6, 1e6)
+    if kind == 4:
+        return rng.random() * 10 ** rng.randint(-30, 30)
+    return rng.randint(-1000, 1000)
+
+
+def random_value(rng: random.Random, depth: int = 0):
+    kind = rng.randint(0, 9 if depth < 4 else 5)
+    if kind == 0:
+        return None
+    if kind == 1:
+        return rng.choice([True, False])
+    if kind in (2, 3):
+        return random_number(rng)
+    if kind in (4, 5):
+        return random_string(rng)
+    if kind in (6, 7):
+        return {random_string(rng): random_value(rng, depth + 1) for _ in range(rng.randint(0, 6))}
+    return [random_value(rng, depth + 1) for _ in range(rng.randint(0, 6))]
+
+
+def random_number_literal(rng: random.Random) -> bytes:
+    """Literales numéricos arbitrarios (mantisas largas, exponentes) para comparar el parseo."""
+    digits = lambda n: "".join(rng.choice("0123456789") for _ in range(n))  # noqa: E731
+    literal = rng.choice(["", "-"]) + (rng.choice("123456789") + digits(rng.randint(0, 20)))
+    if rng.random() < 0.6:
+        literal += "." + digits(rng.randint(1, 20))
+    if rng.random() < 0.4:
+        literal += rng.choice("eE") + rng.choice(["", "+", "-"]) + str(rng.randint(0, 330))
+    return f'{{"n":[{literal}]}}'.encode("utf-8")
+
+
+SPECIAL_BODIES = [
+    b'{"broken": ',                    # JSON inválido
+    b'{"lone": "\\ud800"}',            # surrogate suelto: no codifica a UTF-8
+    b'\xef\xbb\xbf{"bom": 1}',         # BOM UTF-8: json.loads lo rechaza
+    b'{"ctl": "a\x01b"}',              # carácter de control sin escapar
+    b'[NaN, Infinity, -Infinity]',
+    b'[1e400]',
+    b'[1e16, 1E16, 1e+16, 1e-7]',        # formato del exponente según la versión de orjson
+    b'{"a": 1, "a": 2}',               # key duplicada: gana la última
+    b'[18446744073709551616, -9223372036854775809]',
+    b'\xff\xfe',
+    b'[' * 3000 + b']' * 3000,         # anidamiento mayor al límite de recursión
+    b'  {"b" : [1, 2] , "a" : {}}  ',
+    b'',
+]
+
+
+def random_body(rng: random.Random) -> bytes:
+    roll = rng.random()
+    if roll < 0.05:
+        return rng.choice(SPECIAL_BODIES)
+    if roll < 0.20:
+        return random_number_literal(rng)
+    value = random_value(rng)
+    separators = rng.choice([(",", ":"), (", ", ": ")])
+    return json.dumps(value, ensure_ascii=rng.random() < 0.5, separators=separators).encode("utf-8")
+
+
+class CanonicalJsonEquivalenceTest(unittest.TestCase):
+
+    def assert_equivalent(self, body: bytes, content_type: str = CONTENT_TYPE) -> None:
+        expected = legacy_canonical_json_bytes(body, content_type)
+        self.assertEqual(canonical_json.canonical_bytes(body, content_type), expected, body[:200])
+        self.assertEqual(
+            canonical_json.canonical_hexdigest(body, content_type),
+            hashlib.sha256(expected).hexdigest(),
+            body[:200],
+        )
+
+    def test_special_bodies(self):
+        for body in SPECIAL_BODIES:
+            self.assert_equivalent(body)
+
+    def test_non_json_content_type_hashes_raw_body(self):
+        body = b'{"b": 1, "a": 2}'
+        self.assert_equivalent(body, "text/plain")
+        self.assertEqual(canonical_json.canonical_bytes(body, "text/plain"), body)
+
+    def test_random_payloads(self):
+        rng = random.Random(SEED)
+        for _ in range(CASES):
+            self.assert_equivalent(random_body(rng))
+
+    def test_random_payloads_without_orjson(self):
+        rng = random.Random(SEED + 1)
+        with mock.patch.object(canonical_json, "orjson", None):
+            for _ in range(CASES // 3):
+                self.assert_equivalent(random_body(rng))
+
+    @unittest.skipIf(canonical_json.orjson is None, "orjson no instalado")
+    def test_fast_path_is_used_for_plain_payloads(self):
+        body = json.dumps({"sku": "SKU-1", "name": "Ñandú 500mg", "price": 12.5, "tags": ["a", "b"]}).encode()
+        self.assertIsNotNone(canonical_json._orjson_canonical(body))
+        self.assert_equivalent(body)
+
+    @unittest.skipIf(canonical_json.orjson is None, "orjson no instalado")
+    def test_self_check_accepts_installed_orjson(self):
+        self.assertTrue(canonical_json._fast_path_agrees())
+
+    @unittest.skipIf(canonical_json.orjson is None, "orjson no instalado")
+    def test_self_check_rejects_diverging_encoder(self):
+        with mock.patch.object(canonical_json, "_FLOAT_FORMAT_RISK", re.compile(rb"\de[-+]\d")):
+            self.assertFalse(canonical_json._fast_path_agrees())
+        orjson = canonical_json.orjson
+        diverging = types.SimpleNamespace(
+            loads=orjson.loads, dumps=lambda value, option=None: b"[0]", OPT_SORT_KEYS=orjson.OPT_SORT_KEYS,
+            JSONDecodeError=orjson.JSONDecodeError, JSONEncodeError=orjson.JSONEncodeError,
+        )
+        with mock.patch.object(canonical_json, "orjson", diverging):
+            self.assertFalse(canonical_json._fast_path_agrees())
+
+    def test_large_bodies_use_stdlib_path(self):
+        rng = random.Random(SEED + 3)
+        with mock.patch.object(canonical_json, "FAST_PATH_MAX_BYTES", 64):
+            for _ in range(CASES // 10):
+                self.assert_equivalent(random_body(rng))
+
+    def test_object_hexdigest_matches_canonical_body(self):
+        rng = random.Random(SEED + 2)
+        for _ in range(CASES // 3):
+            value = random_value(rng)
+            body = json.dumps(value).encode("utf-8")
+            self.assertEqual(
+                canonical_json.object_hexdigest(json.loads(body)),
+                hashlib.sha256(legacy_canonical_json_bytes(body, CONTENT_TYPE)).hexdigest(),
+            )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -4,33 +4,95 @@ Usa el patrón MVC con modelos, vistas y controladores separados.
 """
 import os
 import logging
-from flask import Flask
+import click
+from flask import Flask, g, request
 from flask_sqlalchemy import SQLAlchemy
 
 from models.product_model import Product, db
+from models.schema import init_schema, schema_is_current
+from models.engine_config import build_engine_options
+from models.replica_router import REPLICA_BIND, init_read_replica
+from cache import build_product_cache
 from controllers.product_controller import ProductController
 from controllers.health_controller import HealthController
 from views.response_view import ResponseView
+from views.json_provider import FastJSONProvider
 
 app = Flask(__name__)
+# Serialización JSON: orjson si está instalado, si no la biblioteca estándar (fechas ISO 8601)
+app.json = FastJSONProvider(app)
 
 # Configuración de la base de datos
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///inventory.db")
 app.config["SQLALCHEMY_DATABASE_URI"] = DATABASE_URL
 app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+# Pool de conexiones (DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_TIMEOUT, DB_POOL_RECYCLE,
+# DB_POOL_PRE_PING, DB_STATEMENT_TIMEOUT_MS); ver models/engine_config.py
+app.config["SQLALCHEMY_ENGINE_OPTIONS"] = build_engine_options(DATABASE_URL)
+app.config["SCHEMA_READY"] = False
+
+# Réplica de lectura opcional para los GET de /inventory/ (ver models/replica_router.py)
+DATABASE_READ_URL = os.getenv("DATABASE_READ_URL")
+if DATABASE_READ_URL:
+    app.config["SQLALCHEMY_BINDS"] = {
+        REPLICA_BIND: {"url": DATABASE_READ_URL, **build_engine_options(DATABASE_READ_URL)}
+    }
+
+# Crea/migra el esquema al arrancar; en "false" se delega al comando `flask --app app init-db`
+DB_AUTO_MIGRATE = os.getenv("DB_AUTO_MIGRATE", "true").lower() == "true"
 
 # Inicializa la base de datos   
 db.init_app(app)
+replica_monitor = init_read_replica(
+    app, db,
+    check_interval=float(os.getenv("DB_REPLICA_CHECK_INTERVAL", "5")),
+    max_lag=float(os.getenv("DB_REPLICA_MAX_LAG_SECONDS", "10"))
+)
 
 # Inicializa los componentes MVC
-product_controller = ProductController()
-health_controller = HealthController(db)
+product_controller = ProductController(cache=build_product_cache())
+health_controller = HealthController(
+    db,
+    schema_ready=lambda: app.config["SCHEMA_READY"],
+    replica_monitor=replica_monitor
+)
 response_view = ResponseView()
 
+def prepare_schema() -> bool:
+    """Crea o migra el esquema una sola vez y actualiza el indicador de readiness."""
+    try:
+        with app.app_context():
+            init_schema(db)
+        app.config["SCHEMA_READY"] = True
+    except Exception:
+        logging.exception("Schema initialization failed")
+        app.config["SCHEMA_READY"] = False
+    return app.config["SCHEMA_READY"]
+
+def detect_migrated_schema() -> bool:
+    """Marca el esquema como listo si ya está migrado; no crea ni altera nada."""
+    try:
+        app.config["SCHEMA_READY"] = schema_is_current(db)
+    except Exception:
+        logging.exception("Schema check failed")
+        db.session.rollback()
+    return app.config["SCHEMA_READY"]
+
 @app.before_request
-def ensure_db():
-    """Crea las tablas si faltan (conveniencia de demostración)."""
-    db.create_all()
+def route_reads():
+    """Las lecturas del inventario pueden ir a la réplica; el resto usa el primario."""
+    if request.method in ("GET", "HEAD") and request.path.startswith("/inventory/"):
+        g.read_replica = True
+
+@app.cli.command("init-db")
+def init_db_command():
+    """Crea o migra el esquema de la base de datos."""
+    if not prepare_schema():
+        raise click.ClickException("Schema initialization failed")
+    click.echo("Schema ready")
+
+if DB_AUTO_MIGRATE:
+    prepare_schema()
 
 @app.route("/ping", methods=["GET"])
 def health():
@@ -39,6 +101,13 @@ def health():
     
     """
     try:
+        # Si la base no estaba lista al arrancar, el probe de readiness reintenta la migración;
+        # sin auto-migración, comprueba si `init-db` ya migró el esquema desde otro proceso
+        if not app.config["SCHEMA_READY"]:
+            if DB_AUTO_MIGRATE:
+                prepare_schema()
+            else:
+                detect_migrated_schema()
         response_data, status_code = health_controller.health_check()
         return response_view.create_json_response(response_data, status_code)
     except Exception as e:
@@ -49,6 +118,14 @@ def health():
         )
         return response_view.create_json_response(error_response, 500)
 
+@app.route("/metrics", methods=["GET"])
+def metrics():
+    """
+    Punto de métricas del servicio (cache de productos).
+    """
+    response_data, status_code = product_controller.cache_metrics()
+    return response_view.create_json_response(response_data, status_code)
+
 @app.route("/inventory/products", methods=["POST"])
 def create_product():
     """
@@ -66,6 +143,38 @@ def create_product():
         )
         return response_view.create_json_response(error_response, 500)
 
+@app.route("/inventory/products:bulk", methods=["POST"])
+def bulk_upsert_products():
+    """
+    Punto de creación o actualización masiva de productos (upsert por lotes).
+    """
+    try:
+        response_data, status_code = product_controller.bulk_upsert_products()
+        return response_view.create_json_response(response_data, status_code)
+    except Exception as e:
+        logging.exception("Unexpected error in bulk_upsert_products")
+        error_response = response_view.format_error_response(
+            "Internal server error", 
+            detail=str(e)
+        )
+        return response_view.create_json_response(error_response, 500)
+
+@app.route("/inventory/products/expiring", methods=["GET"])
+def get_expiring_products():
+    """
+    Punto de consulta de productos por ventana de vencimiento (within_days/limit/after).
+    """
+    try:
+        response_data, status_code = product_controller.get_expiring_products()
+        return response_view.create_json_response(response_data, status_code)
+    except Exception as e:
+        logging.exception("Unexpected error in get_expiring_products")
+        error_response = response_view.format_error_response(
+            "Internal server error", 
+            detail=str(e)
+        )
+        return response_view.create_json_response(error_response, 500)
+
 @app.route("/inventory/products/<sku>", methods=["GET"])
 def get_product(sku):
     """
@@ -73,8 +182,8 @@ def get_product(sku):
 
     """
     try:
-        response_data, status_code = product_controller.get_product_by_sku(sku)
-        return response_view.create_json_response(response_data, status_code)
+        response_data, status_code, etag = product_controller.get_product_by_sku(sku)
+        return response_view.create_conditional_response(response_data, status_code, etag)
     except Exception as e:
         logging.exception("Unexpected error in get_product")
         error_response = response_view.format_error_response(
@@ -86,11 +195,16 @@ def get_product(sku):
 @app.route("/inventory/products", methods=["GET"])
 def get_all_products():
     """
-    Punto de obtención de todos los productos.    
+    Punto de obtención del catálogo paginado (limit/after) o exportado en NDJSON.
     """
     try:
-        response_data, status_code = product_controller.get_all_products()
-        return response_view.create_json_response(response_data, status_code)
+        if product_controller.wants_ndjson():
+            return response_view.create_stream_response(
+                product_controller.stream_all_products(),
+                ProductController.NDJSON_MIMETYPE
+            )
+        response_data, status_code, etag = product_controller.get_all_products()
+        return response_view.create_conditional_response(response_data, status_code, etag)
     except Exception as e:
         logging.exception("Unexpected error in get_all_products")
         error_response = response_view.format_error_response(
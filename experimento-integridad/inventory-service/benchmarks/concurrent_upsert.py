@@ -0,0 +1,75 @@
+"""
+Prueba de concurrencia del alta/actualización por SKU (POST /inventory/products).
+Lanza N POST simultáneos con el mismo SKU por cada ronda contra una base SQLite
+temporal y verifica que exactamente uno responde 201, el resto 200, ninguno 500, y
+que queda una sola fila con version = N.
+
+Uso:
+    python benchmarks/concurrent_upsert.py [--threads 16] [--rounds 20]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+from collections import Counter
+
+# Base propia: nunca toca la DATABASE_URL del entorno
+_DB_DIR = tempfile.mkdtemp(prefix="concurrent-upsert-")
+os.environ["DATABASE_URL"] = f"sqlite:///{_DB_DIR}/inventory.db"
+os.environ.pop("DATABASE_READ_URL", None)
+os.environ["DB_AUTO_MIGRATE"] = "true"
+os.environ["PRODUCT_CACHE_BACKEND"] = "none"
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import app as inventory_app  # noqa: E402
+from models.product_model import Product  # noqa: E402
+
+HEADERS = {"X-Integrity-Validated": "true"}
+
+
+def run_round(sku: str, threads: int) -> Counter:
+    """Un POST por hilo con el mismo SKU, liberados a la vez con una barrera."""
+    barrier = threading.Barrier(threads)
+    statuses = Counter()
+    lock = threading.Lock()
+
+    def post(i: int) -> None:
+        client = inventory_app.app.test_client()
+        barrier.wait()
+        response = client.post("/inventory/products", json={"sku": sku, "name": f"Producto {i}"}, headers=HEADERS)
+        with lock:
+            statuses[response.status_code] += 1
+
+    workers = [threading.Thread(target=post, args=(i,)) for i in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return statuses
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--rounds", type=int, default=20)
+    args = parser.parse_args()
+
+    totals = Counter()
+    for round_number in range(args.rounds):
+        sku = f"SKU-CONC-{round_number:04d}"
+        statuses = run_round(sku, args.threads)
+        totals.update(statuses)
+        assert statuses[201] == 1, f"{sku}: se esperaba exactamente un 201, hubo {dict(statuses)}"
+        assert statuses[200] == args.threads - 1, f"{sku}: respuestas inesperadas {dict(statuses)}"
+        with inventory_app.app.app_context():
+            rows = Product.query.filter_by(sku=sku).all()
+            assert len(rows) == 1, f"{sku}: {len(rows)} filas"
+            assert rows[0].version == args.threads, f"{sku}: version {rows[0].version} != {args.threads}"
+
+    print(f"OK: {args.rounds} rondas x {args.threads} POST concurrentes por SKU -> {dict(totals)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""
+Benchmark de la consulta por ventana de vencimiento sobre un catálogo generado.
+Carga N productos (por defecto 1.000.000), muestra el plan de cada consulta con y sin
+los índices del modelo y mide la latencia media.
+
+Uso:
+    BENCH_DATABASE_URL=postgresql://... python benchmarks/expiring_query_plans.py [--rows N] [--repeat R]
+Sin BENCH_DATABASE_URL usa un SQLite temporal. Nunca usa DATABASE_URL: el benchmark
+inserta filas y borra/recrea los índices de products, así que la base debe ser descartable.
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+# Base propia: la DATABASE_URL del entorno (la del servicio) se ignora a propósito
+_BENCH_URL = os.getenv("BENCH_DATABASE_URL") or f"sqlite:///{tempfile.mkdtemp()}/bench.db"
+if _BENCH_URL == os.getenv("DATABASE_URL"):
+    sys.exit("BENCH_DATABASE_URL no puede ser la misma base que DATABASE_URL")
+os.environ["DATABASE_URL"] = _BENCH_URL
+os.environ.pop("DATABASE_READ_URL", None)
+os.environ["PRODUCT_CACHE_BACKEND"] = "none"
+
+from sqlalchemy import func, text  # noqa: E402
+
+from app import app  # noqa: E402
+from models.product_model import Product, db  # noqa: E402
+
+WORDS = ["Aspirina", "Ibuprofeno", "Amoxicilina", "Omeprazol", "Losartan",
+         "Metformina", "Paracetamol", "Salbutamol", "Insulina", "Atorvastatina"]
+
+
+def generate(rows: int, batch: int = 20000) -> None:
+    """Inserta productos hasta completar `rows` (reutiliza los que ya existan)."""
+    existing = db.session.scalar(db.select(func.count(Product.id)))
+    if existing >= rows:
+        return
+    rng = random.Random(42)
+    today = date.today()
+    now = datetime.utcnow()
+    table = Product.__table__
+    started = time.perf_counter()
+    for offset in range(existing, rows, batch):
+        chunk = []
+        for i in range(offset, min(offset + batch, rows)):
+            chunk.append({
+                "sku": f"SKU-{i:08d}",
+                "name": f"{rng.choice(WORDS)} {rng.randint(1, 1000)}mg",
+                "lot_number": f"LOT-{rng.randint(1, 50000):06d}",
+                "expiration_date": None if i % 20 == 0 else today + timedelta(days=rng.randint(-365, 1095)),
+                "created_at": now,
+                "updated_at": now,
+                "version": 1,
+            })
+        db.session.execute(table.insert(), chunk)
+        db.session.commit()
+    print(f"Generated {rows - existing} rows in {time.perf_counter() - started:.1f}s")
+
+
+def queries() -> dict:
+    today = date.today()
+    return {
+        "window 30d, first page": Product.expiring_select(today, today + timedelta(days=30), None, 101),
+        "window 30d, after cursor": Product.expiring_select(
+            today, today + timedelta(days=30), (today + timedelta(days=15), 500000), 101),
+        "window 365d + lot_number": Product.expiring_select(
+            today, today + timedelta(days=365), None, 101, lot_number="LOT-012345"),
+        "window 365d + name_prefix": Product.expiring_select(
+            today, today + timedelta(days=365), None, 101, name_prefix="Insulina 5"),
+    }
+
+
+def explain(stmt) -> str:
+    dialect = db.engine.dialect.name
+    sql = str(stmt.compile(dialect=db.engine.dialect, compile_kwargs={"literal_binds": True}))
+    if dialect == "postgresql":
+        rows = db.session.execute(text(f"EXPLAIN (ANALYZE, BUFFERS) {sql}")).all()
+        return "\n".join(f"    {row[0]}" for row in rows)
+    if dialect == "sqlite":
+        rows = db.session.execute(text(f"EXPLAIN QUERY PLAN {sql}")).all()
+        return "\n".join(f"    {row[-1]}" for row in rows)
+    return "    (EXPLAIN not supported for this dialect)"
+
+
+def measure(stmt, repeat: int) -> float:
+    started = time.perf_counter()
+    for _ in range(repeat):
+        list(db.session.scalars(stmt))
+    return (time.perf_counter() - started) * 1000.0 / repeat
+
+
+def report(title: str, repeat: int) -> None:
+    print(f"\n=== {title} ===")
+    for name, stmt in queries().items():
+        ms = measure(stmt, repeat)
+        print(f"\n{name}: {ms:.2f} ms")
+        print(explain(stmt))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    with app.app_context():
+        generate(args.rows)
+        db.session.execute(text("ANALYZE"))
+        db.session.commit()
+        report("with indexes", args.repeat)
+
+        indexes = list(Product.__table__.indexes)
+        for index in indexes:
+            index.drop(bind=db.session.connection())
+        db.session.commit()
+        try:
+            report("without indexes", args.repeat)
+        finally:
+            db.session.rollback()
+            for index in indexes:
+                index.create(bind=db.session.connection())
+            db.session.commit()
+
+
+if __name__ == "__main__":
+    main()
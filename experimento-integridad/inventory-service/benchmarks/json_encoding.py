@@ -0,0 +1,87 @@
+"""
+Benchmark de serialización de una página del catálogo (10.000 productos).
+Compara el encoder de Flask por defecto (fechas ya convertidas con isoformat en to_dict,
+como antes) contra FastJSONProvider con la biblioteca estándar y con orjson.
+
+Uso:
+    python benchmarks/json_encoding.py [--products N] [--repeat R]
+"""
+import argparse
+import os
+import sys
+import timeit
+from datetime import date, datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from flask import Flask  # noqa: E402
+from flask.json.provider import DefaultJSONProvider  # noqa: E402
+
+from views.json_provider import FastJSONProvider, orjson  # noqa: E402
+
+
+def make_products(n: int) -> list:
+    """Payloads con la forma de Product.to_dict() (fechas nativas)."""
+    now = datetime(2025, 1, 1, 12, 30, 15, 123456)
+    return [{
+        "id": i,
+        "sku": f"SKU-{i:08d}",
+        "name": f"Producto {i} 500mg",
+        "lot_number": f"LOT-{i % 5000:06d}",
+        "expiration_date": date(2026, 1, 1) + timedelta(days=i % 700),
+        "created_at": now,
+        "updated_at": now,
+        "version": 1 + i % 3,
+    } for i in range(n)]
+
+
+def legacy_payload(products: list) -> list:
+    """Lo que hacía to_dict() antes: isoformat por campo en Python."""
+    return [{
+        **p,
+        "expiration_date": p["expiration_date"].isoformat(),
+        "created_at": p["created_at"].isoformat(),
+        "updated_at": p["updated_at"].isoformat(),
+    } for p in products]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--products", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    app = Flask(__name__)
+    products = make_products(args.products)
+    default_provider = DefaultJSONProvider(app)
+    stdlib_provider = FastJSONProvider(app)
+    stdlib_provider.use_orjson = False
+
+    cases = {
+        "flask default (isoformat en to_dict)": lambda: default_provider.response(
+            {"products": legacy_payload(products)}),
+        "FastJSONProvider stdlib": lambda: stdlib_provider.response({"products": products}),
+    }
+    if orjson is not None:
+        fast_provider = FastJSONProvider(app)
+        fast_provider.use_orjson = True
+        cases["FastJSONProvider orjson"] = lambda: fast_provider.response({"products": products})
+    else:
+        print("orjson no está instalado: se omite ese caso")
+
+    with app.app_context():
+        # Todas las variantes deben producir el mismo documento JSON
+        reference = app.json.loads(cases["flask default (isoformat en to_dict)"]().get_data())
+        for name, case in cases.items():
+            assert app.json.loads(case().get_data()) == reference, name
+
+        baseline = None
+        print(f"{'encoder':<40} | {'ms/respuesta':>12} | {'speedup':>7}")
+        for name, case in cases.items():
+            ms = timeit.timeit(case, number=args.repeat) * 1000.0 / args.repeat
+            baseline = baseline or ms
+            print(f"{name:<40} | {ms:>12.2f} | {baseline / ms:>6.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,6 @@
+"""
+Cache de productos del componente inventory-service.
+"""
+from cache.product_cache import ProductCache, MemoryBackend, RedisBackend, build_product_cache
+
+__all__ = ["ProductCache", "MemoryBackend", "RedisBackend", "build_product_cache"]
@@ -0,0 +1,316 @@
+"""
+Cache read-through de productos por SKU para el componente inventory-service.
+Guarda el to_dict() serializado con el JSON provider de la app; un SKU inexistente
+se guarda como "null" (cache negativo) con un TTL más corto. Toda ruta de escritura
+invalida las claves que toca, y cada invalidación sube la generación de la clave: un
+llenado que leyó la base antes de una invalidación se descarta en lugar de guardar la
+fila vieja todo el TTL.
+"""
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+from flask import current_app
+
+
+class MemoryBackend:
+    """
+    Backend en proceso: TTL por entrada y expulsión LRU al superar max_entries.
+    Cada worker tiene el suyo, así que una escritura atendida por otro worker no lo
+    invalida: con varios workers una entrada puede quedar vieja hasta su TTL.
+    """
+    
+    def __init__(self, max_entries: int = 10000, clock=time.monotonic):
+        self.max_entries = max_entries
+        self._clock = clock
+        self._entries: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.evictions = 0
+        # Generaciones: secuencia global y la de la última invalidación de cada clave
+        # (acotado a max_entries; las olvidadas cuentan como invalidadas en _floor)
+        self._sequence = 0
+        self._invalidated: "OrderedDict[str, int]" = OrderedDict()
+        self._floor = 0
+    
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at <= self._clock():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+    
+    def generation(self, key: str) -> int:
+        with self._lock:
+            return self._sequence
+    
+    def set(self, key: str, value: str, ttl: float, generation: Optional[int] = None) -> bool:
+        with self._lock:
+            if generation is not None and self._invalidated.get(key, self._floor) > generation:
+                return False
+            self._entries[key] = (self._clock() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+            return True
+    
+    def delete(self, *keys: str) -> None:
+        with self._lock:
+            self._sequence += 1
+            for key in keys:
+                self._entries.pop(key, None)
+                self._invalidated[key] = self._sequence
+                self._invalidated.move_to_end(key)
+            while len(self._invalidated) > self.max_entries:
+                _, forgotten = self._invalidated.popitem(last=False)
+                self._floor = max(self._floor, forgotten)
+    
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "backend": "memory",
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "evictions": self.evictions
+            }
+
+
+class RedisBackend:
+    """
+    Backend compartido entre instancias y workers sobre un cliente redis-py.
+    La generación de cada clave vive en "gen:<clave>" (INCR al invalidar) y el guardado
+    condicionado usa WATCH/MULTI sobre ella.
+    """
+    
+    GENERATION_TTL = 3600
+    
+    def __init__(self, client: Any):
+        self.client = client
+    
+    def get(self, key: str) -> Optional[str]:
+        value = self.client.get(key)
+        if isinstance(value, bytes):
+            return value.decode("utf-8")
+        return value
+    
+    def generation(self, key: str) -> int:
+        return int(self.client.get(self._generation_key(key)) or 0)
+    
+    def set(self, key: str, value: str, ttl: float, generation: Optional[int] = None) -> bool:
+        if generation is None:
+            self.client.set(key, value, ex=max(1, int(ttl)))
+            return True
+        from redis.exceptions import WatchError
+        generation_key = self._generation_key(key)
+        with self.client.pipeline() as pipe:
+            try:
+                pipe.watch(generation_key)
+                if int(pipe.get(generation_key) or 0) != generation:
+                    return False
+                pipe.multi()
+                pipe.set(key, value, ex=max(1, int(ttl)))
+                pipe.execute()
+                return True
+            except WatchError:
+                # Una invalidación entró entre la lectura de la generación y el SET
+                return False
+    
+    def delete(self, *keys: str) -> None:
+        if not keys:
+            return
+        pipe = self.client.pipeline(transaction=False)
+        for key in keys:
+            pipe.incr(self._generation_key(key))
+            pipe.expire(self._generation_key(key), self.GENERATION_TTL)
+        pipe.delete(*keys)
+        pipe.execute()
+    
+    @staticmethod
+    def _generation_key(key: str) -> str:
+        return f"gen:{key}"
+    
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": "redis"}
+
+
+class ProductCache:
+    """Cache de payloads de producto con métricas de hit ratio y latencia."""
+    
+    NOT_FOUND = "null"
+    
+    def __init__(self, backend: Any, ttl: float = 60.0, negative_ttl: float = 5.0,
+                 prefix: str = "inventory:product:v2:"):
+        self.backend = backend
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.prefix = prefix
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+        self.errors = 0
+        self.invalidations = 0
+        self.stale_fills_discarded = 0
+        self._lookup_ms_total = 0.0
+        self._lookup_ms_max = 0.0
+    
+    def lookup(self, sku: str) -> Tuple[bool, Optional[Dict[str, Any]]]:
+        """
+        Busca un producto en cache.
+        
+        Args:
+            sku: SKU del producto
+            
+        Returns:
+            Tuple de (encontrado_en_cache, producto o None si se cacheó como inexistente)
+        """
+        started = time.perf_counter()
+        try:
+            value = self.backend.get(self._key(sku))
+        except Exception:
+            # Un backend caído degrada a la base de datos, no a un error 500
+            logging.exception("Product cache lookup failed")
+            value = None
+            self._count("errors")
+        elapsed_ms = (time.perf_counter() - started) * 1000.0
+        
+        with self._lock:
+            self._lookup_ms_total += elapsed_ms
+            self._lookup_ms_max = max(self._lookup_ms_max, elapsed_ms)
+            if value is None:
+                self.misses += 1
+                return False, None
+            if value == self.NOT_FOUND:
+                self.negative_hits += 1
+                return True, None
+            self.hits += 1
+        return True, current_app.json.loads(value)
+    
+    def begin_fill(self, sku: str) -> Optional[int]:
+        """
+        Generación actual del SKU; se toma antes de leer la base y se pasa a store/store_missing.
+        
+        Returns:
+            Generación, o None si el backend falló (entonces no se guarda nada)
+        """
+        try:
+            return self.backend.generation(self._key(sku))
+        except Exception:
+            logging.exception("Product cache generation lookup failed")
+            self._count("errors")
+            return None
+    
+    def store(self, sku: str, product: Dict[str, Any], generation: Optional[int]) -> None:
+        """Guarda el payload to_dict() de un producto si el SKU no se invalidó desde begin_fill."""
+        try:
+            value = current_app.json.dumps(product)
+        except Exception:
+            logging.exception("Product cache serialization failed")
+            self._count("errors")
+            return
+        self._set(sku, value, self.ttl, generation)
+    
+    def store_missing(self, sku: str, generation: Optional[int]) -> None:
+        """Recuerda por negative_ttl segundos que el SKU no existe (mismo control que store)."""
+        if self.negative_ttl > 0:
+            self._set(sku, self.NOT_FOUND, self.negative_ttl, generation)
+    
+    def invalidate(self, skus: Iterable[str]) -> None:
+        """Descarta las entradas (positivas o negativas) de los SKUs escritos."""
+        keys = [self._key(sku) for sku in skus]
+        if not keys:
+            return
+        try:
+            self.backend.delete(*keys)
+            self._count("invalidations", len(keys))
+        except Exception:
+            logging.exception("Product cache invalidation failed")
+            self._count("errors")
+    
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.negative_hits + self.misses
+            stats = {
+                "ttl": self.ttl,
+                "negative_ttl": self.negative_ttl,
+                "lookups": lookups,
+                "hits": self.hits,
+                "negative_hits": self.negative_hits,
+                "misses": self.misses,
+                "hit_ratio": round((self.hits + self.negative_hits) / lookups, 4) if lookups else 0.0,
+                "lookup_ms_avg": round(self._lookup_ms_total / lookups, 3) if lookups else 0.0,
+                "lookup_ms_max": round(self._lookup_ms_max, 3),
+                "invalidations": self.invalidations,
+                "stale_fills_discarded": self.stale_fills_discarded,
+                "errors": self.errors
+            }
+        try:
+            stats.update(self.backend.stats())
+        except Exception:
+            logging.exception("Product cache backend stats failed")
+        return stats
+    
+    def _set(self, sku: str, value: str, ttl: float, generation: Optional[int]) -> None:
+        if generation is None:
+            return
+        try:
+            if not self.backend.set(self._key(sku), value, ttl, generation):
+                self._count("stale_fills_discarded")
+        except Exception:
+            logging.exception("Product cache store failed")
+            self._count("errors")
+    
+    def _key(self, sku: str) -> str:
+        return f"{self.prefix}{sku}"
+    
+    def _count(self, name: str, amount: int = 1) -> None:
+        with self._lock:
+            setattr(self, name, getattr(self, name) + amount)
+
+
+def build_product_cache() -> Optional[ProductCache]:
+    """
+    Construye el cache según el entorno:
+        PRODUCT_CACHE_BACKEND: memory, redis o none; por defecto memory con un solo worker
+            y none con varios (WEB_CONCURRENCY > 1), porque el cache en memoria de un
+            worker no se entera de las escrituras que atiende otro
+        PRODUCT_CACHE_TTL / PRODUCT_CACHE_NEGATIVE_TTL: segundos (60 / 5)
+        PRODUCT_CACHE_MAX_ENTRIES: tope del backend en memoria (10000)
+        REDIS_URL: conexión del backend redis (requiere el paquete redis)
+    
+    Returns:
+        ProductCache o None si el cache está deshabilitado
+    """
+    workers = int(os.getenv("WEB_CONCURRENCY", "1"))
+    kind = os.getenv("PRODUCT_CACHE_BACKEND", "memory" if workers <= 1 else "none").lower()
+    if kind == "none":
+        return None
+    
+    backend = None
+    if kind == "redis":
+        try:
+            import redis
+            backend = RedisBackend(redis.Redis.from_url(os.getenv("REDIS_URL", "redis://localhost:6379/0")))
+        except ImportError:
+            logging.warning("redis package not installed; falling back to in-memory product cache")
+    if backend is None:
+        backend = MemoryBackend(int(os.getenv("PRODUCT_CACHE_MAX_ENTRIES", "10000")))
+        if workers > 1:
+            logging.warning(
+                "In-memory product cache with %d workers: writes handled by another worker "
+                "stay stale until PRODUCT_CACHE_TTL expires", workers
+            )
+    
+    return ProductCache(
+        backend,
+        ttl=float(os.getenv("PRODUCT_CACHE_TTL", "60")),
+        negative_ttl=float(os.getenv("PRODUCT_CACHE_NEGATIVE_TTL", "5"))
+    )
@@ -2,16 +2,22 @@
 Controlador de salud para el componente inventory-service.
 Gestiona las operaciones de verificación de salud y estado del sistema.
 """
-from typing import Dict, Any, Tuple
+from typing import Dict, Any, Tuple, Callable, Optional
 from flask_sqlalchemy import SQLAlchemy
 from sqlalchemy import text
 
+from models.engine_config import pool_stats
+from models.replica_router import REPLICA_BIND, ReplicaMonitor
+
 
 class HealthController:
     """Gestiona las operaciones de verificación de salud."""
     
-    def __init__(self, db: SQLAlchemy):
+    def __init__(self, db: SQLAlchemy, schema_ready: Callable[[], bool] = lambda: True,
+                 replica_monitor: Optional[ReplicaMonitor] = None):
         self.db = db
+        self.schema_ready = schema_ready
+        self.replica_monitor = replica_monitor
     
     def health_check(self) -> Tuple[Dict[str, Any], int]:
         """
@@ -24,9 +30,22 @@ class HealthController:
             # Prueba la conexión a la base de datos
             self.db.session.execute(text("SELECT 1"))
             
+            if not self.schema_ready():
+                return {
+                    "status": "starting",
+                    "database": "connected",
+                    "schema": "pending",
+                    "pool": pool_stats(self.db.engine.pool),
+                    **self._replica_report(),
+                    "service": "inventory-service"
+                }, 503
+            
             return {
                 "status": "ok",
                 "database": "connected",
+                "schema": "ready",
+                "pool": pool_stats(self.db.engine.pool),
+                **self._replica_report(),
                 "service": "inventory-service"
             }, 200
             
@@ -34,6 +53,24 @@ class HealthController:
             return {
                 "status": "error",
                 "database": "disconnected",
+                "pool": pool_stats(self.db.engine.pool),
                 "service": "inventory-service",
                 "error": str(e)
             }, 503
+    
+    def _replica_report(self) -> Dict[str, Any]:
+        """
+        Estado de la réplica de lectura; una réplica caída no afecta la salud del servicio
+        porque las lecturas vuelven al primario.
+        
+        Returns:
+            Diccionario con la clave "replica" o vacío si no hay réplica configurada
+        """
+        if not self.replica_monitor:
+            return {}
+        return {
+            "replica": {
+                **self.replica_monitor.stats(),
+                "pool": pool_stats(self.db.engines[REPLICA_BIND].pool)
+            }
+        }
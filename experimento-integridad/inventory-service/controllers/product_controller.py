@@ -2,16 +2,32 @@
 Controlador de productos para el componente inventory-service.
 Gestiona la lógica y operaciones relacionadas con los productos.
 """
-from datetime import date
-from typing import Dict, Any, Tuple, Optional
-from flask import request
+import logging
+from contextlib import nullcontext
+from datetime import date, timedelta
+from typing import Dict, Any, List, Tuple, Optional, Iterator
+from flask import current_app, request
 
-from models.product_model import Product, db
+from models.product_model import Product, CatalogState, db
+from models.replica_router import primary_reads, read_with_fallback
+from cache import ProductCache
 
 
 class ProductController:
     """Gestiona las operaciones relacionadas con los productos."""
     
+    DEFAULT_PAGE_LIMIT = 100
+    MAX_PAGE_LIMIT = 1000
+    STREAM_BATCH_SIZE = 500
+    NDJSON_MIMETYPE = "application/x-ndjson"
+    BULK_MAX_ITEMS = 50000
+    BULK_CHUNK_SIZE = 1000
+    DEFAULT_EXPIRING_DAYS = 30
+    MAX_EXPIRING_DAYS = 3650
+    
+    def __init__(self, cache: Optional[ProductCache] = None):
+        self.cache = cache
+    
     def create_or_update_product(self) -> Tuple[Dict[str, Any], int]:
         """
         Crea un nuevo producto o actualiza uno existente.
@@ -45,63 +61,314 @@ class ProductController:
             return {"error": exp_error}, 400
         
         try:
-            # Verifica si el producto existe
-            existing_product = Product.find_by_sku(sku)
-            
-            if existing_product:
-                # Actualiza el producto existente
-                existing_product.update_product(name, lot_number, exp_date)
-                db.session.commit()
-                return {
-                    "status": "updated",
-                    "product": existing_product.to_dict()
-                }, 200
-            else:
-                # Crea un nuevo producto
-                new_product = Product.create_product(sku, name, lot_number, exp_date)
-                db.session.commit()
-                return {
-                    "status": "created",
-                    "product": new_product.to_dict()
-                }, 201
+            # Upsert atómico: una sola sentencia, sin carrera entre SELECT e INSERT
+            product, created = Product.upsert(sku, name, lot_number, exp_date)
+            # El payload sale de la fila del RETURNING: tras el commit el objeto queda
+            # expirado y to_dict() haría un SELECT más
+            payload = product.to_dict()
+            db.session.commit()
+            self._invalidate([sku])
+            return {
+                "status": "created" if created else "updated",
+                "product": payload
+            }, 201 if created else 200
                 
         except Exception as e:
             db.session.rollback()
             return {"error": f"Database error: {str(e)}"}, 500
     
-    def get_product_by_sku(self, sku: str) -> Tuple[Dict[str, Any], int]:
+    def bulk_upsert_products(self) -> Tuple[Dict[str, Any], int]:
+        """
+        Crea o actualiza un lote de productos con un upsert nativo por bloque.
+        Acepta una lista de productos o {"products": [...]}; los ítems inválidos se
+        reportan por índice sin bloquear el resto. Si un SKU se repite, gana el último y
+        las apariciones anteriores se reportan como "superseded" (no se escriben).
+        
+        Returns:
+            Tuple de (response_data, status_code)
         """
-        Obtiene un producto por SKU.
+        if request.headers.get("X-Integrity-Validated", "").lower() != "true":
+            return {"error": "Integrity not validated"}, 403
+        
+        try:
+            data = request.get_json(force=True)
+        except Exception:
+            return {"error": "Invalid JSON"}, 400
+        
+        items = data.get("products") if isinstance(data, dict) else data
+        if not isinstance(items, list) or not items:
+            return {"error": "Body must be a non-empty list of products"}, 400
+        if len(items) > self.BULK_MAX_ITEMS:
+            return {"error": f"Batch exceeds {self.BULK_MAX_ITEMS} products"}, 413
+        
+        results: List[Dict[str, Any]] = []
+        rows: Dict[str, Dict[str, Any]] = {}
+        indexes: Dict[str, int] = {}
+        for index, item in enumerate(items):
+            row, error = self._bulk_row(item)
+            if error:
+                sku = item.get("sku") if isinstance(item, dict) else None
+                results.append({"index": index, "sku": sku, "status": "invalid", "error": error})
+                continue
+            # validate_required_fields garantiza sku de tipo str: es la misma clave que devuelve RETURNING
+            sku = str(row["sku"])
+            results.append({"index": index, "sku": sku, "status": None})
+            if sku in indexes:
+                # Sus datos no se escriben: no cuenta como created/updated
+                results[indexes[sku]]["status"] = "superseded"
+            rows[sku] = row
+            indexes[sku] = index
+        for result in results:
+            if result["status"] == "superseded":
+                result["superseded_by"] = indexes[result["sku"]]
+        
+        skus = list(rows)
+        for start in range(0, len(skus), self.BULK_CHUNK_SIZE):
+            chunk = skus[start:start + self.BULK_CHUNK_SIZE]
+            try:
+                created = Product.bulk_upsert([rows[sku] for sku in chunk])
+                db.session.commit()
+                self._invalidate(chunk)
+            except Exception as e:
+                db.session.rollback()
+                logging.exception("Bulk upsert chunk failed")
+                created = None
+                error = f"Database error: {str(e)}"
+            for sku in chunk:
+                if created is None:
+                    results[indexes[sku]].update(status="error", error=error)
+                else:
+                    results[indexes[sku]]["status"] = "created" if created.get(sku) else "updated"
+        
+        counts = {status: 0 for status in ("created", "updated", "superseded", "invalid", "error")}
+        for result in results:
+            counts[result["status"]] += 1
+        return {"results": results, "count": len(results), **counts}, 200
+    
+    def _bulk_row(self, item: Any) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+        """
+        Valida un ítem del lote con las mismas reglas que el alta individual.
+        
+        Returns:
+            Tuple de (fila para el upsert, error_message)
+        """
+        if not isinstance(item, dict):
+            return None, "Product must be an object"
+        is_valid, error_message = Product.validate_required_fields(item)
+        if not is_valid:
+            return None, error_message
+        exp_date, exp_error = Product.validate_expiration_date(item.get("expiration_date"))
+        if exp_error:
+            return None, exp_error
+        return {
+            "sku": item["sku"],
+            "name": item["name"],
+            "lot_number": item.get("lot_number"),
+            "expiration_date": exp_date
+        }, None
+    
+    def get_product_by_sku(self, sku: str) -> Tuple[Optional[Dict[str, Any]], int, Optional[str]]:
+        """
+        Obtiene un producto por SKU con soporte de GET condicional.
         
         Args:
             sku: Product SKU
             
         Returns:
-            Tuple de (response_data, status_code)
+            Tuple de (response_data, status_code, etag); 304 sin cuerpo si If-None-Match coincide
         """
+        if self.cache:
+            cached, payload = self.cache.lookup(sku)
+            if cached:
+                if payload is None:
+                    return {"error": "Product not found"}, 404, None
+                etag = Product.etag_for(payload["id"], payload["version"])
+                if self._not_modified(etag):
+                    return None, 304, etag
+                return {"product": payload}, 200, etag
+        
+        # Generación tomada antes de leer: si una escritura invalida el SKU mientras tanto,
+        # el llenado se descarta en vez de cachear la fila vieja
+        generation = self.cache.begin_fill(sku) if self.cache else None
         try:
-            product = Product.find_by_sku(sku)
+            # Con cache, el miss se lee del primario: no se guarda lo que devuelva una réplica atrasada
+            with primary_reads() if self.cache else nullcontext():
+                product = read_with_fallback(db.session, lambda: Product.find_by_sku(sku))
             if not product:
-                return {"error": "Product not found"}, 404
+                if self.cache:
+                    self.cache.store_missing(sku, generation)
+                return {"error": "Product not found"}, 404, None
             
-            return {"product": product.to_dict()}, 200
+            etag = product.etag
+            if self._not_modified(etag):
+                return None, 304, etag
+            
+            payload = product.to_dict()
+            if self.cache:
+                self.cache.store(sku, payload, generation)
+            return {"product": payload}, 200, etag
             
         except Exception as e:
-            return {"error": f"Database error: {str(e)}"}, 500
+            return {"error": f"Database error: {str(e)}"}, 500, None
+    
+    def get_all_products(self) -> Tuple[Optional[Dict[str, Any]], int, Optional[str]]:
+        """
+        Obtiene una página del catálogo con paginación por cursor (keyset sobre id).
+        El ETag se deriva de la versión del catálogo, sin leer ni serializar productos.
+        
+        Query params:
+            limit: tamaño de página (por defecto 100, máximo 1000)
+            after: id del último producto de la página anterior
+        
+        Returns:
+            Tuple de (response_data, status_code, etag); 304 sin cuerpo si If-None-Match coincide
+        """
+        limit, after, error = self._pagination_params()
+        if error:
+            return {"error": error}, 400, None
+        
+        try:
+            # La versión se lee antes que la página: si una escritura se cuela en medio,
+            # el ETag queda viejo y el siguiente poll descarga de nuevo (nunca al revés)
+            etag = f"c{read_with_fallback(db.session, CatalogState.current)}.{after or 0}.{limit}"
+            if self._not_modified(etag):
+                return None, 304, etag
+            
+            # Se pide una fila extra para saber si hay página siguiente sin contar la tabla
+            products = read_with_fallback(db.session, lambda: Product.page_after(after, limit + 1))
+            page = products[:limit]
+            next_after = page[-1].id if len(products) > limit else None
+            return {
+                "products": [product.to_dict() for product in page],
+                "count": len(page),
+                "limit": limit,
+                "next_after": next_after
+            }, 200, etag
+            
+        except Exception as e:
+            return {"error": f"Database error: {str(e)}"}, 500, None
     
-    def get_all_products(self) -> Tuple[Dict[str, Any], int]:
+    def get_expiring_products(self) -> Tuple[Dict[str, Any], int]:
         """
-        Obtiene todos los productos.
+        Obtiene los productos que vencen en los próximos within_days días,
+        paginados por cursor sobre (expiration_date, id).
+        
+        Query params:
+            within_days: tamaño de la ventana desde hoy (por defecto 30)
+            limit: tamaño de página (por defecto 100, máximo 1000)
+            after: cursor "YYYY-MM-DD:id" (next_after de la página anterior)
+            lot_number: lote exacto (opcional)
+            name_prefix: prefijo del nombre (opcional)
         
         Returns:
             Tuple de (response_data, status_code)
         """
         try:
-            products = Product.query.all()
+            limit = int(request.args.get("limit", self.DEFAULT_PAGE_LIMIT))
+            within_days = int(request.args.get("within_days", self.DEFAULT_EXPIRING_DAYS))
+        except ValueError:
+            return {"error": "limit and within_days must be integers"}, 400
+        if limit < 1 or limit > self.MAX_PAGE_LIMIT:
+            return {"error": f"limit must be between 1 and {self.MAX_PAGE_LIMIT}"}, 400
+        if within_days < 0 or within_days > self.MAX_EXPIRING_DAYS:
+            return {"error": f"within_days must be between 0 and {self.MAX_EXPIRING_DAYS}"}, 400
+        
+        after = None
+        after_raw = request.args.get("after")
+        if after_raw:
+            try:
+                after_date, after_id = after_raw.split(":", 1)
+                after = (date.fromisoformat(after_date), int(after_id))
+            except ValueError:
+                return {"error": "after must have the form YYYY-MM-DD:id"}, 400
+        
+        start = date.today()
+        until = start + timedelta(days=within_days)
+        try:
+            products = read_with_fallback(db.session, lambda: Product.expiring_between(
+                start, until, after, limit + 1,
+                lot_number=request.args.get("lot_number"),
+                name_prefix=request.args.get("name_prefix")
+            ))
+            page = products[:limit]
+            next_after = None
+            if len(products) > limit:
+                last = page[-1]
+                next_after = f"{last.expiration_date.isoformat()}:{last.id}"
             return {
-                "products": [product.to_dict() for product in products],
-                "count": len(products)
+                "products": [product.to_dict() for product in page],
+                "count": len(page),
+                "limit": limit,
+                "from": start.isoformat(),
+                "until": until.isoformat(),
+                "next_after": next_after
             }, 200
             
         except Exception as e:
             return {"error": f"Database error: {str(e)}"}, 500
+    
+    def cache_metrics(self) -> Tuple[Dict[str, Any], int]:
+        """
+        Métricas del cache de productos (hit ratio, latencia de lectura, invalidaciones).
+        
+        Returns:
+            Tuple de (response_data, status_code)
+        """
+        if not self.cache:
+            return {"product_cache": {"enabled": False}}, 200
+        return {"product_cache": {"enabled": True, **self.cache.stats()}}, 200
+    
+    def wants_ndjson(self) -> bool:
+        """Indica si el cliente pidió la exportación completa en NDJSON."""
+        if request.args.get("format", "").lower() == "ndjson":
+            return True
+        return request.accept_mimetypes.best == self.NDJSON_MIMETYPE
+    
+    def stream_all_products(self) -> Iterator[str]:
+        """
+        Exporta el catálogo completo como NDJSON (un producto por línea).
+        La memoria se mantiene constante: filas por lotes desde un cursor del servidor.
+        
+        Returns:
+            Generador de bloques de texto NDJSON
+        """
+        lines = []
+        try:
+            for product in Product.iter_all(self.STREAM_BATCH_SIZE):
+                lines.append(current_app.json.dumps(product.to_dict()))
+                if len(lines) >= self.STREAM_BATCH_SIZE:
+                    yield "\n".join(lines) + "\n"
+                    lines = []
+            if lines:
+                yield "\n".join(lines) + "\n"
+        except Exception:
+            # Los headers ya se enviaron: solo queda registrar y cortar el stream
+            logging.exception("Error streaming products")
+    
+    def _pagination_params(self) -> Tuple[int, Optional[int], Optional[str]]:
+        """
+        Lee y valida limit/after de la query string.
+        
+        Returns:
+            Tuple de (limit, after, error_message)
+        """
+        try:
+            limit = int(request.args.get("limit", self.DEFAULT_PAGE_LIMIT))
+            after_raw = request.args.get("after")
+            after = int(after_raw) if after_raw not in (None, "") else None
+        except ValueError:
+            return 0, None, "limit and after must be integers"
+        
+        if limit < 1 or limit > self.MAX_PAGE_LIMIT:
+            return 0, None, f"limit must be between 1 and {self.MAX_PAGE_LIMIT}"
+        return limit, after, None
+    
+    def _invalidate(self, skus: List[str]) -> None:
+        """Invalida en cache los SKUs recién escritos (ya confirmados en la base)."""
+        if self.cache:
+            self.cache.invalidate(skus)
+    
+    @staticmethod
+    def _not_modified(etag: str) -> bool:
+        """Indica si el ETag actual coincide con If-None-Match (incluye "*")."""
+        return request.if_none_match.contains(etag)
@@ -0,0 +1,129 @@
+"""
+Configuración del engine de SQLAlchemy para el componente inventory-service.
+Lee el pool de conexiones del entorno y mide la espera de checkout, para dimensionar
+las instancias contra el límite de conexiones de Cloud SQL.
+"""
+import os
+import threading
+import time
+from typing import Any, Dict, Mapping, Optional
+
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import Pool, QueuePool
+
+
+class CheckoutMetrics:
+    """Contadores de espera al pedir una conexión al pool (thread-safe)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_ms_total = 0.0
+        self.wait_ms_max = 0.0
+
+    def record(self, wait_ms: float, timed_out: bool = False) -> None:
+        with self._lock:
+            if timed_out:
+                self.timeouts += 1
+                return
+            self.checkouts += 1
+            self.wait_ms_total += wait_ms
+            self.wait_ms_max = max(self.wait_ms_max, wait_ms)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "checkouts": self.checkouts,
+                "checkout_timeouts": self.timeouts,
+                "checkout_wait_ms_avg": round(self.wait_ms_total / self.checkouts, 3) if self.checkouts else 0.0,
+                "checkout_wait_ms_max": round(self.wait_ms_max, 3)
+            }
+
+
+class TimedQueuePool(QueuePool):
+    """QueuePool que registra cuánto espera cada checkout por una conexión libre."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.metrics = CheckoutMetrics()
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            conn = super()._do_get()
+        except PoolTimeoutError:
+            self.metrics.record(0.0, timed_out=True)
+            raise
+        self.metrics.record((time.perf_counter() - started) * 1000.0)
+        return conn
+
+    def recreate(self) -> "TimedQueuePool":
+        # dispose()/invalidación recrean el pool: se conservan las métricas acumuladas
+        pool = super().recreate()
+        pool.metrics = self.metrics
+        return pool
+
+
+def _env_bool(env: Mapping[str, str], name: str, default: str) -> bool:
+    return env.get(name, default).lower() == "true"
+
+
+def build_engine_options(database_url: str, env: Optional[Mapping[str, str]] = None) -> Dict[str, Any]:
+    """
+    Construye SQLALCHEMY_ENGINE_OPTIONS desde el entorno:
+        DB_POOL_SIZE: conexiones persistentes por worker (8, igual a los threads de gunicorn)
+        DB_MAX_OVERFLOW: conexiones extra temporales (2)
+        DB_POOL_TIMEOUT: segundos de espera por una conexión libre (10)
+        DB_POOL_RECYCLE: segundos antes de reciclar una conexión (1800)
+        DB_POOL_PRE_PING: valida la conexión al tomarla del pool (true)
+        DB_STATEMENT_TIMEOUT_MS: statement_timeout de PostgreSQL, 0 = sin límite (0)
+    SQLite conserva los valores por defecto de Flask-SQLAlchemy.
+
+    Args:
+        database_url: URL de la base de datos
+        env: variables de entorno (por defecto os.environ)
+
+    Returns:
+        Diccionario de opciones para create_engine
+    """
+    env = os.environ if env is None else env
+    if database_url.startswith("sqlite"):
+        return {}
+
+    options: Dict[str, Any] = {
+        "poolclass": TimedQueuePool,
+        "pool_size": int(env.get("DB_POOL_SIZE", "8")),
+        "max_overflow": int(env.get("DB_MAX_OVERFLOW", "2")),
+        "pool_timeout": float(env.get("DB_POOL_TIMEOUT", "10")),
+        "pool_recycle": int(env.get("DB_POOL_RECYCLE", "1800")),
+        "pool_pre_ping": _env_bool(env, "DB_POOL_PRE_PING", "true"),
+    }
+    statement_timeout = int(env.get("DB_STATEMENT_TIMEOUT_MS", "0"))
+    if statement_timeout > 0 and database_url.startswith("postgresql"):
+        options["connect_args"] = {"options": f"-c statement_timeout={statement_timeout}"}
+    return options
+
+
+def pool_stats(pool: Pool) -> Dict[str, Any]:
+    """
+    Estado del pool: conexiones en uso/libres y, si es TimedQueuePool, espera de checkout.
+
+    Args:
+        pool: pool del engine
+
+    Returns:
+        Diccionario con el estado del pool
+    """
+    stats: Dict[str, Any] = {"class": type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        stats.update({
+            "size": pool.size(),
+            "in_use": pool.checkedout(),
+            "idle": pool.checkedin(),
+            "timeout": pool.timeout()
+        })
+    metrics = getattr(pool, "metrics", None)
+    if isinstance(metrics, CheckoutMetrics):
+        stats.update(metrics.stats())
+    return stats
@@ -3,17 +3,28 @@ Modelo de datos para el componente inventory-service.
 Gestiona los datos y lógica de negocio relacionados con los productos.
 """
 from datetime import datetime, date
-from typing import Dict, Any, Optional, List
+from typing import Dict, Any, Optional, List, Iterator, Tuple
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import literal_column, tuple_, update
+from sqlalchemy.dialects import postgresql, sqlite
+
+from models.replica_router import RoutingSession
 
 # Esto será inicializado en la aplicación principal
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={"class_": RoutingSession})
 
 
 class Product(db.Model):
     """Modelo de datos para representar los productos del inventario."""
     
     __tablename__ = "products"
+    __table_args__ = (
+        # Ventana de vencimiento paginada por (expiration_date, id): rango ordenado, sin sort
+        db.Index("ix_products_expiration_id", "expiration_date", "id"),
+        db.Index("ix_products_lot_number", "lot_number"),
+        # text_pattern_ops permite usar el índice en LIKE 'prefijo%' con cualquier collation
+        db.Index("ix_products_name_prefix", "name", postgresql_ops={"name": "text_pattern_ops"}),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     sku = db.Column(db.String(64), unique=True, nullable=False)
@@ -21,16 +32,33 @@ class Product(db.Model):
     lot_number = db.Column(db.String(64), nullable=True)
     expiration_date = db.Column(db.Date, nullable=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    # Se incrementa en cada escritura; junto con id forma el ETag del producto
+    version = db.Column(db.Integer, default=1, server_default="1", nullable=False)
+    
+    @staticmethod
+    def etag_for(product_id: int, version: int) -> str:
+        """ETag fuerte de un producto: cambia si y solo si cambia su versión."""
+        return f"p{product_id}.{version}"
+    
+    @property
+    def etag(self) -> str:
+        return self.etag_for(self.id, self.version)
     
     def to_dict(self) -> Dict[str, Any]:
-        """Convierte el producto a una representación de diccionario."""
+        """
+        Convierte el producto a una representación de diccionario.
+        Las fechas quedan como date/datetime; el JSON provider las serializa en ISO 8601.
+        """
         return {
             "id": self.id,
             "sku": self.sku,
             "name": self.name,
             "lot_number": self.lot_number,
-            "expiration_date": self.expiration_date.isoformat() if self.expiration_date else None,
-            "created_at": self.created_at.isoformat()
+            "expiration_date": self.expiration_date,
+            "created_at": self.created_at,
+            "updated_at": self.updated_at,
+            "version": self.version
         }
     
     @classmethod
@@ -39,24 +67,135 @@ class Product(db.Model):
         return cls.query.filter_by(sku=sku).first()
     
     @classmethod
-    def create_product(cls, sku: str, name: str, lot_number: str = None, 
-                      expiration_date: date = None) -> 'Product':
-        """Crea un nuevo producto."""
-        product = cls(
-            sku=sku,
-            name=name,
-            lot_number=lot_number,
-            expiration_date=expiration_date
+    def page_after(cls, after_id: Optional[int], limit: int) -> List['Product']:
+        """Página ordenada por id (keyset): productos con id > after_id."""
+        query = cls.query.order_by(cls.id)
+        if after_id is not None:
+            query = query.filter(cls.id > after_id)
+        return query.limit(limit).all()
+    
+    @classmethod
+    def expiring_between(cls, start: date, until: date, after: Optional[Tuple[date, int]],
+                         limit: int, lot_number: Optional[str] = None,
+                         name_prefix: Optional[str] = None) -> List['Product']:
+        """
+        Página de productos que vencen en [start, until], ordenada por (expiration_date, id).
+        
+        Args:
+            start: primer día de la ventana
+            until: último día de la ventana
+            after: (expiration_date, id) del último producto de la página anterior
+            limit: tamaño de página
+            lot_number: filtra por lote exacto (opcional)
+            name_prefix: filtra por prefijo del nombre (opcional)
+            
+        Returns:
+            Lista de productos
+        """
+        stmt = cls.expiring_select(start, until, after, limit, lot_number, name_prefix)
+        return list(db.session.scalars(stmt))
+    
+    @classmethod
+    def expiring_select(cls, start: date, until: date, after: Optional[Tuple[date, int]],
+                        limit: int, lot_number: Optional[str] = None,
+                        name_prefix: Optional[str] = None):
+        """SELECT de expiring_between (también lo usa el benchmark de planes de consulta)."""
+        stmt = db.select(cls).where(cls.expiration_date >= start, cls.expiration_date <= until)
+        if after is not None:
+            stmt = stmt.where(tuple_(cls.expiration_date, cls.id) > tuple_(*after))
+        if lot_number:
+            stmt = stmt.where(cls.lot_number == lot_number)
+        if name_prefix:
+            stmt = stmt.where(cls.name.startswith(name_prefix, autoescape=True))
+        return stmt.order_by(cls.expiration_date, cls.id).limit(limit)
+    
+    @classmethod
+    def iter_all(cls, batch_size: int = 500) -> Iterator['Product']:
+        """Recorre todo el catálogo con un cursor del lado del servidor, batch_size filas a la vez."""
+        stmt = db.select(cls).order_by(cls.id).execution_options(yield_per=batch_size)
+        yield from db.session.scalars(stmt)
+    
+    @classmethod
+    def upsert(cls, sku: str, name: str, lot_number: Optional[str] = None,
+               expiration_date: Optional[date] = None) -> Tuple["Product", bool]:
+        """
+        Crea o actualiza un producto en una sola sentencia atómica (sin SELECT previo).
+        Dos peticiones concurrentes con el mismo SKU no compiten por la restricción única.
+        
+        Args:
+            sku: SKU del producto
+            name: nombre del producto
+            lot_number: número de lote (opcional)
+            expiration_date: fecha de vencimiento (opcional)
+            
+        Returns:
+            Tuple de (producto, True si se creó / False si se actualizó)
+        """
+        now = datetime.utcnow()
+        row = {"sku": sku, "name": name, "lot_number": lot_number, "expiration_date": expiration_date}
+        stmt = cls._upsert_statement([row], now).returning(cls, cls._inserted_flag(now))
+        product, inserted = db.session.execute(
+            stmt, execution_options={"populate_existing": True}
+        ).one()
+        CatalogState.bump()
+        return product, bool(inserted)
+    
+    @classmethod
+    def bulk_upsert(cls, rows: List[Dict[str, Any]]) -> Dict[str, bool]:
+        """
+        Inserta o actualiza un lote en una sola sentencia INSERT ... ON CONFLICT (sku) DO UPDATE.
+        
+        Args:
+            rows: diccionarios con sku, name, lot_number, expiration_date (SKUs únicos en el lote)
+            
+        Returns:
+            Diccionario {sku: True si se creó, False si se actualizó}
+        """
+        if not rows:
+            return {}
+        now = datetime.utcnow()
+        stmt = cls._upsert_statement(rows, now).returning(cls.sku, cls._inserted_flag(now))
+        created = {str(sku): bool(inserted) for sku, inserted in db.session.execute(stmt)}
+        CatalogState.bump()
+        return created
+    
+    @classmethod
+    def _upsert_statement(cls, rows: List[Dict[str, Any]], now: datetime):
+        """INSERT ... ON CONFLICT (sku) DO UPDATE; created_at solo se fija al insertar."""
+        stmt = cls._dialect_insert().values(
+            [{**row, "created_at": now, "updated_at": now, "version": 1} for row in rows]
+        )
+        return stmt.on_conflict_do_update(
+            index_elements=[cls.sku],
+            set_={
+                "name": stmt.excluded.name,
+                "lot_number": stmt.excluded.lot_number,
+                "expiration_date": stmt.excluded.expiration_date,
+                "updated_at": stmt.excluded.updated_at,
+                "version": cls.version + 1,
+            },
         )
-        db.session.add(product)
-        return product
     
-    def update_product(self, name: str, lot_number: str = None, 
-                      expiration_date: date = None) -> None:
-        """Actualiza la información del producto."""
-        self.name = name
-        self.lot_number = lot_number
-        self.expiration_date = expiration_date
+    @classmethod
+    def _dialect_insert(cls):
+        """Construcción INSERT con soporte ON CONFLICT según el motor (PostgreSQL o SQLite)."""
+        dialect = db.session.get_bind().dialect.name
+        if dialect == "postgresql":
+            return postgresql.insert(cls)
+        if dialect == "sqlite":
+            return sqlite.insert(cls)
+        raise NotImplementedError(f"Upsert not supported for dialect '{dialect}'")
+    
+    @classmethod
+    def _inserted_flag(cls, now: datetime):
+        """
+        Expresión RETURNING que distingue filas creadas de actualizadas.
+        En PostgreSQL una fila recién insertada tiene xmax = 0; en SQLite se reconoce
+        porque conserva el created_at de esta sentencia (el UPDATE no lo modifica).
+        """
+        if db.session.get_bind().dialect.name == "postgresql":
+            return literal_column("xmax = 0").label("inserted")
+        return (cls.created_at == now).label("inserted")
     
     @staticmethod
     def validate_expiration_date(expiration_str: str) -> tuple[Optional[date], Optional[str]]:
@@ -71,6 +210,8 @@ class Product(db.Model):
         """
         if not expiration_str:
             return None, None
+        if not isinstance(expiration_str, str):
+            return None, "Invalid expiration_date format. Use YYYY-MM-DD"
             
         try:
             exp_date = date.fromisoformat(expiration_str)
@@ -96,5 +237,36 @@ class Product(db.Model):
         
         if not sku or not name:
             return False, "Faltan campos requeridos: sku, name"
+        if not isinstance(sku, str) or not isinstance(name, str):
+            return False, "Los campos sku y name deben ser texto"
+        if data.get("lot_number") is not None and not isinstance(data["lot_number"], str):
+            return False, "El campo lot_number debe ser texto"
         
         return True, None
+
+
+class CatalogState(db.Model):
+    """
+    Fila única con la versión del catálogo; cada escritura de productos la incrementa
+    en la misma transacción, así el ETag de una página no requiere leer productos.
+    """
+    
+    __tablename__ = "catalog_state"
+    
+    id = db.Column(db.Integer, primary_key=True)
+    version = db.Column(db.BigInteger, nullable=False, default=0)
+    
+    ROW_ID = 1
+    
+    @classmethod
+    def current(cls) -> int:
+        """Versión actual del catálogo (0 si la fila aún no existe)."""
+        version = db.session.scalar(db.select(cls.version).where(cls.id == cls.ROW_ID))
+        return version or 0
+    
+    @classmethod
+    def bump(cls) -> None:
+        """Incrementa la versión; se confirma junto con la escritura de productos."""
+        db.session.execute(
+            update(cls).where(cls.id == cls.ROW_ID).values(version=cls.version + 1)
+        )
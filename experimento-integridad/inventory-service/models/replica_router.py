@@ -0,0 +1,192 @@
+"""
+Enrutamiento de lecturas a una réplica para el componente inventory-service.
+Con DATABASE_READ_URL configurada, las peticiones marcadas como de solo lectura
+(GET bajo /inventory/) consultan la réplica; las escrituras, y toda lectura posterior
+a una escritura en la misma petición, van al primario. Si la réplica no responde o
+su retraso supera el máximo, se vuelve al primario hasta el siguiente chequeo; la lectura
+que encontró el error se repite una vez en el primario (read_with_fallback).
+"""
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Optional, TypeVar
+
+import sqlalchemy as sa
+from flask import current_app, g, has_request_context
+from flask_sqlalchemy.session import Session
+
+REPLICA_BIND = "replica"
+
+T = TypeVar("T")
+
+# Segundos desde la última transacción aplicada; NULL (0) si el servidor no es réplica
+PG_REPLICA_LAG_SQL = (
+    "SELECT COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)"
+)
+
+
+class ReplicaMonitor:
+    """Chequeo periódico de disponibilidad y retraso de la réplica (un solo hilo sondea)."""
+
+    def __init__(self, check_interval: float = 5.0, max_lag: float = 10.0, clock=time.monotonic):
+        self.check_interval = check_interval
+        self.max_lag = max_lag
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._next_check = 0.0
+        self.healthy_state = False
+        self.lag: Optional[float] = None
+        self.last_error: Optional[str] = None
+        self.fallbacks = 0
+
+    def attach(self, engine: sa.engine.Engine) -> None:
+        """Un error de conexión en una consulta real marca la réplica como caída."""
+        sa.event.listen(engine, "handle_error", self._on_error)
+
+    def healthy(self, engine: sa.engine.Engine) -> bool:
+        """
+        Indica si la réplica puede atender lecturas; sondea como máximo cada check_interval.
+
+        Args:
+            engine: engine de la réplica
+
+        Returns:
+            True si la réplica está disponible y dentro del retraso máximo
+        """
+        if self._clock() >= self._next_check and self._lock.acquire(blocking=False):
+            try:
+                self._probe(engine)
+            finally:
+                self._next_check = self._clock() + self.check_interval
+                self._lock.release()
+        if not self.healthy_state:
+            self.fallbacks += 1
+        return self.healthy_state
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "healthy": self.healthy_state,
+            "lag_seconds": round(self.lag, 3) if self.lag is not None else None,
+            "max_lag_seconds": self.max_lag,
+            "fallbacks": self.fallbacks,
+            "last_error": self.last_error
+        }
+
+    def _probe(self, engine: sa.engine.Engine) -> None:
+        try:
+            with engine.connect() as conn:
+                if engine.dialect.name == "postgresql":
+                    lag = float(conn.scalar(sa.text(PG_REPLICA_LAG_SQL)) or 0.0)
+                else:
+                    conn.execute(sa.text("SELECT 1"))
+                    lag = 0.0
+        except Exception as e:
+            self._mark_down(str(e))
+            return
+        self.lag = lag
+        self.healthy_state = lag <= self.max_lag
+        self.last_error = None if self.healthy_state else f"replica lag {lag:.1f}s"
+
+    def _on_error(self, context) -> None:
+        # original_exception es la excepción cruda del driver; la envuelta es sqlalchemy_exception
+        if context.is_disconnect or isinstance(context.sqlalchemy_exception, sa.exc.OperationalError):
+            self._mark_down(str(context.original_exception))
+            self._next_check = self._clock() + self.check_interval
+
+    def _mark_down(self, error: str) -> None:
+        if self.healthy_state:
+            logging.warning("Read replica unavailable, falling back to primary: %s", error)
+        self.healthy_state = False
+        self.lag = None
+        self.last_error = error
+
+
+@contextmanager
+def primary_reads():
+    """
+    Fuerza el primario para las lecturas del bloque. Se usa en las lecturas que llenan
+    un cache compartido: lo leído de una réplica atrasada quedaría servido todo el TTL.
+    """
+    if not has_request_context():
+        yield
+        return
+    previous = g.get("read_replica", False)
+    g.read_replica = False
+    try:
+        yield
+    finally:
+        g.read_replica = previous
+
+
+def read_with_fallback(session, read: Callable[[], T]) -> T:
+    """
+    Ejecuta una lectura; si falló por un error operacional en la réplica, la repite una vez
+    en el primario (el monitor ya la marcó como caída en handle_error).
+
+    Args:
+        session: sesión de la petición (db.session)
+        read: función sin argumentos que hace la lectura
+
+    Returns:
+        Lo que devuelva read
+    """
+    if has_request_context():
+        g.replica_used = False
+    try:
+        return read()
+    except sa.exc.OperationalError as e:
+        if not (has_request_context() and g.get("replica_used", False)):
+            raise
+        logging.warning("Read failed on replica, retrying on primary: %s", e.orig)
+        session.rollback()
+        with primary_reads():
+            return read()
+
+
+class RoutingSession(Session):
+    """Session de Flask-SQLAlchemy que elige réplica o primario por sentencia."""
+
+    def __init__(self, db, **kwargs):
+        super().__init__(db, **kwargs)
+        # La sesión vive lo que la petición: tras una escritura todo va al primario
+        self._wrote = False
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and self._reads_from_replica(clause):
+            replica = self._db.engines.get(REPLICA_BIND)
+            monitor = current_app.extensions.get("replica_monitor")
+            if replica is not None and monitor is not None and monitor.healthy(replica):
+                g.replica_used = True
+                return replica
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+    def _reads_from_replica(self, clause) -> bool:
+        if self._flushing or isinstance(clause, sa.UpdateBase):
+            self._wrote = True
+            return False
+        if self._wrote or not has_request_context():
+            return False
+        return g.get("read_replica", False)
+
+
+def init_read_replica(app, db, check_interval: float, max_lag: float) -> Optional[ReplicaMonitor]:
+    """
+    Registra el monitor de la réplica si el bind está configurado (llamar tras db.init_app).
+
+    Args:
+        app: aplicación Flask
+        db: instancia de SQLAlchemy con RoutingSession
+        check_interval: segundos entre chequeos de la réplica
+        max_lag: retraso máximo tolerado en segundos
+
+    Returns:
+        ReplicaMonitor o None si no hay réplica configurada
+    """
+    if REPLICA_BIND not in (app.config.get("SQLALCHEMY_BINDS") or {}):
+        return None
+    monitor = ReplicaMonitor(check_interval=check_interval, max_lag=max_lag)
+    with app.app_context():
+        monitor.attach(db.engines[REPLICA_BIND])
+    app.extensions["replica_monitor"] = monitor
+    return monitor
@@ -0,0 +1,86 @@
+"""
+Gestión del esquema de la base de datos para el componente inventory-service.
+Se ejecuta una sola vez al arrancar (o con `flask --app app init-db`), nunca por petición.
+"""
+from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import inspect, text
+from sqlalchemy.exc import IntegrityError
+
+from models.product_model import Product, CatalogState
+
+# Columnas agregadas después de la primera versión del esquema: (tabla, columna, DDL, backfill)
+ADDITIVE_COLUMNS = [
+    ("products", "updated_at", "TIMESTAMP",
+     "UPDATE products SET updated_at = created_at WHERE updated_at IS NULL"),
+    ("products", "version", "INTEGER NOT NULL DEFAULT 1", None),
+]
+
+
+def init_schema(db: SQLAlchemy) -> None:
+    """
+    Crea las tablas que falten, agrega las columnas e índices nuevos a tablas
+    existentes y asegura la fila de versión del catálogo.
+
+    Args:
+        db: instancia de SQLAlchemy ya asociada a la aplicación (requiere app context)
+    """
+    db.create_all()
+    _add_missing_columns(db)
+    _create_missing_indexes(db)
+    _seed_catalog_state(db)
+
+
+def schema_is_current(db: SQLAlchemy) -> bool:
+    """
+    Indica si el esquema ya fue migrado (p. ej. por `init-db` en otro proceso): tablas,
+    columnas aditivas, índices y la fila de CatalogState, que es el último paso de init_schema.
+
+    Args:
+        db: instancia de SQLAlchemy ya asociada a la aplicación (requiere app context)
+
+    Returns:
+        True si no falta nada de lo que crea init_schema
+    """
+    inspector = inspect(db.engine)
+    tables = set(inspector.get_table_names())
+    if not {Product.__tablename__, CatalogState.__tablename__} <= tables:
+        return False
+    for table, column, _, _ in ADDITIVE_COLUMNS:
+        if column not in {c["name"] for c in inspector.get_columns(table)}:
+            return False
+    indexes = {index["name"] for index in inspector.get_indexes(Product.__tablename__)}
+    if any(index.name not in indexes for index in Product.__table__.indexes):
+        return False
+    return db.session.get(CatalogState, CatalogState.ROW_ID) is not None
+
+
+def _add_missing_columns(db: SQLAlchemy) -> None:
+    """Migración aditiva: create_all no altera tablas que ya existen."""
+    inspector = inspect(db.engine)
+    with db.engine.begin() as conn:
+        for table, column, ddl, backfill in ADDITIVE_COLUMNS:
+            existing = {c["name"] for c in inspector.get_columns(table)}
+            if column in existing:
+                continue
+            conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}"))
+            if backfill:
+                conn.execute(text(backfill))
+
+
+def _create_missing_indexes(db: SQLAlchemy) -> None:
+    """Crea los índices del modelo que falten en tablas ya existentes."""
+    with db.engine.begin() as conn:
+        for index in Product.__table__.indexes:
+            index.create(bind=conn, checkfirst=True)
+
+
+def _seed_catalog_state(db: SQLAlchemy) -> None:
+    """Crea la fila única de CatalogState si no existe."""
+    if db.session.get(CatalogState, CatalogState.ROW_ID) is not None:
+        return
+    db.session.add(CatalogState(id=CatalogState.ROW_ID, version=0))
+    try:
+        db.session.commit()
+    except IntegrityError:
+        # Otro worker la creó al mismo tiempo
+        db.session.rollback()
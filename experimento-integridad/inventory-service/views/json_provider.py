@@ -0,0 +1,63 @@
+"""
+Proveedor JSON de la aplicación.
+Usa orjson si está instalado (serializa date/datetime de forma nativa en C) y,
+si no, el encoder de la biblioteca estándar con fechas en formato ISO 8601.
+"""
+from datetime import date
+from typing import Any
+
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - dependencia opcional
+    orjson = None
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """JSON provider de Flask: mismas opciones que el por defecto, fechas ISO y encoder rápido."""
+
+    use_orjson = orjson is not None
+
+    @staticmethod
+    def default(o: Any) -> Any:
+        """Fechas en ISO 8601 (Flask usaría el formato HTTP); el resto como Flask."""
+        if isinstance(o, date):
+            return o.isoformat()
+        return DefaultJSONProvider.default(o)
+
+    def dumps(self, obj: Any, **kwargs: Any) -> str:
+        """
+        Serializa a texto JSON compacto (una sola línea, apto para NDJSON).
+
+        Args:
+            obj: objeto a serializar
+            **kwargs: opciones de json.dumps (solo se aplican con la biblioteca estándar)
+
+        Returns:
+            Texto JSON
+        """
+        if self.use_orjson:
+            return orjson.dumps(obj, default=self.default, option=self._orjson_options()).decode("utf-8")
+        kwargs.setdefault("separators", (",", ":"))
+        return super().dumps(obj, **kwargs)
+
+    def loads(self, s: str | bytes, **kwargs: Any) -> Any:
+        if self.use_orjson and not kwargs:
+            return orjson.loads(s)
+        return super().loads(s, **kwargs)
+
+    def response(self, *args: Any, **kwargs: Any):
+        """Respuesta JSON; con orjson se escriben los bytes directamente, sin pasar por str."""
+        if not self.use_orjson:
+            return super().response(*args, **kwargs)
+
+        obj = self._prepare_response_obj(args, kwargs)
+        option = self._orjson_options()
+        if self.compact is False or (self.compact is None and self._app.debug):
+            option |= orjson.OPT_INDENT_2
+        body = orjson.dumps(obj, default=self.default, option=option)
+        return self._app.response_class(body + b"\n", mimetype=self.mimetype)
+
+    def _orjson_options(self) -> int:
+        return orjson.OPT_SORT_KEYS if self.sort_keys else 0
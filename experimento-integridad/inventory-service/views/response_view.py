@@ -1,8 +1,8 @@
 """
 Gestiona el formateo y serialización de respuestas.
 """
-from typing import Dict, Any
-from flask import jsonify, make_response
+from typing import Dict, Any, Iterable, Optional
+from flask import Response, jsonify, make_response, stream_with_context
 
 
 class ResponseView:
@@ -22,6 +22,43 @@ class ResponseView:
         """
         return jsonify(data), status_code
     
+    @staticmethod
+    def create_conditional_response(data: Optional[Dict[str, Any]], status_code: int,
+                                    etag: Optional[str] = None):
+        """
+        Crea una respuesta JSON con ETag; un 304 se envía sin cuerpo.
+        
+        Args:
+            data: diccionario de datos de la respuesta (None en 304)
+            status_code: HTTP status code
+            etag: ETag fuerte de la representación (opcional)
+            
+        Returns:
+            Objeto de respuesta Flask
+        """
+        if status_code == 304:
+            response = Response(status=304)
+        else:
+            response = make_response(jsonify(data), status_code)
+        if etag:
+            response.set_etag(etag)
+        return response
+    
+    @staticmethod
+    def create_stream_response(chunks: Iterable[str], mimetype: str, status_code: int = 200):
+        """
+        Crea una respuesta en streaming a partir de un generador.
+        
+        Args:
+            chunks: generador de bloques del cuerpo
+            mimetype: tipo de contenido de la respuesta
+            status_code: HTTP status code
+            
+        Returns:
+            Objeto de respuesta Flask en streaming
+        """
+        return Response(stream_with_context(chunks), status=status_code, mimetype=mimetype)
+    
     @staticmethod
     def create_response(data: Dict[str, Any], status_code: int):
         """